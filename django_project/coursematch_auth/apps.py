@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoursematchAuthConfig(AppConfig):
     name = 'coursematch_auth'
+
+    def ready(self):
+        # Connect the signal handlers that maintain the search index
+        from . import signals
@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from coursematch_auth.models import Student
+from coursematch_auth import search
+from coursematchapp.synthetic import generate_university
+
+QUERIES = ['Ch', 'Chen', 'Maya', 'Soft', 'Computer Science', 'Patel', 'Econ', 'Qui', 'zz']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compare student search through the full-text index with the LIKE search on a '
+            'synthetic set of students. All rows are created in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.index_enabled():
+            raise CommandError('The full-text search index is not available on this database')
+        try:
+            with transaction.atomic():
+                generate_university(courses=0, students=options['students'], follows=0, seed=options['seed'])
+                self.stdout.write('{:<20} {:>8} {:>12} {:>12}'.format('query', 'matches', 'like (ms)', 'fts (ms)'))
+                for query in QUERIES:
+                    like = Student.objects.select_related('user')
+                    like_count, like_time = self.measure(lambda: list(search.like_search(like, query)), options['repeat'])
+                    fts = Student.objects.select_related('user')
+                    fts_count, fts_time = self.measure(lambda: list(search.search_students(fts, query)), options['repeat'])
+                    self.stdout.write('{:<20} {:>8} {:>12.2f} {:>12.2f}'.format(query, fts_count, like_time, fts_time))
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def measure(self, func, repeat):
+        '''
+        Return the number of results and the median time in milliseconds of func
+        '''
+        times = []
+        for i in range(repeat):
+            begin = time.perf_counter()
+            results = func()
+            times.append((time.perf_counter() - begin) * 1000)
+        times.sort()
+        return len(results), times[len(times) // 2]
@@ -0,0 +1,75 @@
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from .models import Student
+
+# Seconds a logged in Student stays in the cache without being saved
+STUDENT_TIMEOUT = 600
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+# Cache key of a Student and its User
+def student_key(user_id):
+    return 'student:{}'.format(user_id)
+
+# Get a Student and its User from the cache or the database
+def cached_student(user_id):
+    '''
+    Return the Student with the given id, with its user already loaded, or None if there is
+    no such Student. Runs no query when the Student is in the cache.
+    '''
+    key = student_key(user_id)
+    student = cache.get(key)
+    if student is None:
+        student = Student.objects.select_related('user').filter(pk=user_id).first()
+        if student is not None:
+            cache.set(key, student, STUDENT_TIMEOUT)
+    return student
+
+# Drop Students from the cache after they or their User change
+def forget_students(user_ids):
+    cache.delete_many([student_key(user_id) for user_id in user_ids])
+
+# Get the logged in User, going through the Student cache
+def get_user(request):
+    '''
+    Same as django.contrib.auth.get_user for users of the ModelBackend who have a Student,
+    but loads the User from the Student cache. Other users go through get_user.
+    '''
+    session = request.session
+    user_id = session.get(SESSION_KEY)
+    if user_id is None or session.get(BACKEND_SESSION_KEY) != MODEL_BACKEND:
+        return auth.get_user(request)
+    student = cached_student(user_id)
+    if student is None or not student.user.is_active:
+        return auth.get_user(request)
+    user = student.user
+    # Log out sessions created before a password change, like get_user
+    if not constant_time_compare(session.get(HASH_SESSION_KEY), user.get_session_auth_hash()):
+        session.flush()
+        return AnonymousUser()
+    return user
+
+# Get the Student of the logged in User
+def get_student(request):
+    if not request.user.is_authenticated:
+        return None
+    try:
+        return request.user.student
+    except Student.DoesNotExist:
+        return None
+
+
+class StudentMiddleware(AuthenticationMiddleware):
+    '''
+    AuthenticationMiddleware that sets request.user and request.student lazily from the
+    Student cache, so that a logged in request with a cached session runs no query until
+    the view needs other data. The Student is loaded with its User in one query on a miss.
+    '''
+    def process_request(self, request):
+        assert hasattr(request, 'session'), 'StudentMiddleware requires SessionMiddleware'
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.student = SimpleLazyObject(lambda: get_student(request))
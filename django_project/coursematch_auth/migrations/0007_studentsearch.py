@@ -0,0 +1,38 @@
+from django.db import migrations, OperationalError
+
+
+# Create and fill the FTS5 table used to search students
+def create_search_index(apps, schema_editor):
+    # The full-text index is only available on SQLite builds with FTS5
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE coursematch_auth_studentsearch USING fts5("
+                "first_name, last_name, major, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')")
+        except OperationalError:
+            return
+        cursor.execute(
+            'INSERT INTO coursematch_auth_studentsearch (rowid, first_name, last_name, major) '
+            'SELECT s.user_id, u.first_name, u.last_name, s.major '
+            'FROM coursematch_auth_student s INNER JOIN auth_user u ON u.id = s.user_id')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS coursematch_auth_studentsearch')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematch_auth', '0006_auto_20190423_2307'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+# Set a counter column to the number of rows pointing at each row in a through table
+def recount_sql(schema_editor, model, column, through, field):
+    quote = schema_editor.quote_name
+    return 'UPDATE {table} SET {column} = (SELECT COUNT(*) FROM {through} WHERE {through}.{field} = {table}.{pk})'.format(
+        table=quote(model._meta.db_table), column=quote(column), through=quote(through._meta.db_table),
+        field=quote(through._meta.get_field(field).column), pk=quote(model._meta.pk.column))
+
+# Count the students the existing students follow
+def backfill_following(apps, schema_editor):
+    Student = apps.get_model('coursematch_auth', 'Student')
+    schema_editor.execute(recount_sql(schema_editor, Student, 'following_count', Student.following.through, 'from_student'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematch_auth', '0007_studentsearch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_following, migrations.RunPython.noop),
+    ]
@@ -28,6 +28,8 @@ class Student(models.Model):
     courses = models.ManyToManyField(Course)
     classes = models.ManyToManyField(Class)
     following = models.ManyToManyField('self')
+    # Number of students followed, kept exact by the signals (see coursematchapp.counters)
+    following_count = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return self.user.username
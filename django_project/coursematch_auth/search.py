@@ -0,0 +1,98 @@
+import re
+from django.db import connection
+from django.db.models import Q
+
+# Full-text index of the searchable Student fields, keyed by the Student's user id
+SEARCH_TABLE = 'coursematch_auth_studentsearch'
+
+# Whether the index exists in each database, checked once per process
+_index_exists = {}
+
+# Check whether the full-text index can be used
+def index_enabled():
+    '''
+    Return True when the database is SQLite and the FTS5 search table exists
+    '''
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _index_exists:
+        _index_exists[name] = SEARCH_TABLE in connection.introspection.table_names()
+    return _index_exists[name]
+
+# Index a student
+def index_student(user_id):
+    '''
+    Replace the index entry of the Student with the given user id from its current
+    Student and User rows. Does nothing if the Student does not exist yet.
+    '''
+    if not index_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(SEARCH_TABLE), [user_id])
+        cursor.execute(
+            'INSERT INTO {} (rowid, first_name, last_name, major) '
+            'SELECT s.user_id, u.first_name, u.last_name, s.major '
+            'FROM coursematch_auth_student s INNER JOIN auth_user u ON u.id = s.user_id '
+            'WHERE s.user_id = %s'.format(SEARCH_TABLE), [user_id])
+
+# Remove a student from the index
+def unindex_student(user_id):
+    if not index_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(SEARCH_TABLE), [user_id])
+
+# Rebuild the whole index
+def rebuild_index():
+    '''
+    Re-create every index entry from the Student and User tables, used after bulk
+    inserts that do not send signals
+    '''
+    if not index_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(SEARCH_TABLE))
+        cursor.execute(
+            'INSERT INTO {} (rowid, first_name, last_name, major) '
+            'SELECT s.user_id, u.first_name, u.last_name, s.major '
+            'FROM coursematch_auth_student s INNER JOIN auth_user u ON u.id = s.user_id'.format(SEARCH_TABLE))
+
+# Convert a search string to an FTS5 query
+def match_expression(query):
+    '''
+    Return an FTS5 query matching rows where every word of the query string starts a word
+    in the first name, last name or major, or None if the query has no words
+    '''
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+# Search students by name or major
+def like_search(students, query):
+    '''
+    Filter a Student queryset on first name, last name or major containing the query string
+    '''
+    return students.filter(Q(user__first_name__icontains=query) |
+                           Q(user__last_name__icontains=query) |
+                           Q(major__icontains=query))
+
+def search_students(students, query):
+    '''
+    Filter a Student queryset to the students matching the query string, best matches first.
+    Uses the full-text index when it is available and falls back to like_search otherwise.
+    A blank query matches every student.
+    '''
+    if query.strip() == '':
+        return students
+    match = match_expression(query)
+    if match is None or not index_enabled():
+        return like_search(students, query)
+    return students.extra(
+        tables=[SEARCH_TABLE],
+        where=['{0}.rowid = coursematch_auth_student.user_id'.format(SEARCH_TABLE),
+               '{0} MATCH %s'.format(SEARCH_TABLE)],
+        params=[match],
+        select={'search_rank': '{0}.rank'.format(SEARCH_TABLE)},
+        order_by=['search_rank'])
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Student
+from . import search
+from .middleware import forget_students
+
+# Fields of each model stored in the search index
+USER_SEARCH_FIELDS = {'first_name', 'last_name'}
+STUDENT_SEARCH_FIELDS = {'major'}
+
+# Keep the search index up to date when a User's name changes
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_student(instance.pk)
+
+# Keep the search index up to date when a Student's major changes
+@receiver(post_save, sender=Student)
+def index_student(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not STUDENT_SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_student(instance.pk)
+
+# Remove deleted Students from the search index
+@receiver(post_delete, sender=Student)
+def unindex_student(sender, instance, **kwargs):
+    search.unindex_student(instance.pk)
+
+# Drop cached logged in Students when they or their User change, once the transaction
+# commits so that a concurrent request cannot cache them again as they were before
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Student)
+def forget_student(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_students([instance.pk]))
@@ -1,3 +1,80 @@
-from django.test import TestCase
+import json
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from coursematch_auth.models import Student
+from coursematch_auth import search
 
-# Create your tests here.
+
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        self.ada = Student.objects.create_student('ada', 'password123', 'Ada', 'Lovelace')
+        self.alan = Student.objects.create_student('alan', 'password123', 'Alan', 'Turing')
+        self.alan.major = 'Computer Science'
+        self.alan.save()
+
+    def search(self, query):
+        return [s.user.username for s in search.search_students(Student.objects.select_related('user'), query)]
+
+    def test_index_follows_saves(self):
+        self.assertTrue(search.index_enabled())
+        self.assertEqual(self.search('lovel'), ['ada'])
+        self.assertEqual(self.search('computer sci'), ['alan'])
+        self.ada.user.last_name = 'King'
+        self.ada.user.save()
+        self.assertEqual(self.search('lovel'), [])
+        self.assertEqual(self.search('king'), ['ada'])
+        self.alan.delete()
+        self.assertEqual(self.search('turing'), [])
+
+    def test_blank_query_returns_everyone(self):
+        self.assertEqual(sorted(self.search('')), ['ada', 'alan'])
+
+    def test_search_profiles_uses_index(self):
+        resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'Tur'})
+        self.assertEqual([d['uname'] for d in resp.json()['data']], ['alan'])
+
+
+class StudentMiddlewareTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.ada = Student.objects.create_student('ada', 'password123', 'Ada', 'Lovelace')
+        self.client.post('/coursematchauth/loginuser/', json.dumps({'username': 'ada', 'password': 'password123'}),
+                         content_type='application/json')
+
+    def test_no_queries_when_cached(self):
+        # The first request loads the student and its user in one query
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/coursematchauth/isauth/').content, b'Authenticated')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/coursematchauth/isauth/').content, b'Authenticated')
+
+    def test_changes_reach_the_request(self):
+        self.client.get('/coursematchauth/isauth/')
+        self.ada.user.first_name = 'Augusta'
+        self.ada.user.save()
+        self.assertEqual(self.client.get('/coursematchauth/getuserinfo/').json()['firstname'], 'Augusta')
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.ada.user.first_name = 'Ada'
+            self.ada.user.save()
+            raise ValueError
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/coursematchauth/getuserinfo/').json()['firstname'], 'Augusta')
+        # Changing the password logs out existing sessions
+        self.ada.user.set_password('password456')
+        self.ada.user.save()
+        self.assertEqual(self.client.get('/coursematchauth/isauth/').content, b'NotAuthenticated')
+
+    def test_user_info_reads_the_following_counter(self):
+        alan = Student.objects.create_student('alan', 'password123', 'Alan', 'Turing')
+        self.client.get('/coursematchauth/isauth/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/coursematchauth/getuserinfo/').json()['following'], 0)
+        # Nothing is dropped from the cache before the commit
+        with self.assertRaises(ValueError), transaction.atomic():
+            alan.following.add(self.ada)
+            raise ValueError
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/coursematchauth/getuserinfo/').json()['following'], 0)
+        alan.following.add(self.ada)
+        self.assertEqual(self.client.get('/coursematchauth/getuserinfo/').json()['following'], 1)
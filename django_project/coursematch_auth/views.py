@@ -2,9 +2,9 @@ from django.shortcuts import render
 from django.http import HttpResponse
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
-from django.http import JsonResponse
 import json
 from .models import Student
+from coursematchapp.encoding import JsonResponse
 
 # Function to log in a user
 def login_user(request):
@@ -37,32 +37,39 @@ def get_auth(request):
     else:
         return HttpResponse("NotAuthenticated")
 
-# Get user information
-def get_user_info(request):
+# Build the user information of a Student
+def user_info_dict(student, nb_following):
     '''
-    Retreive all user information about the Student object associated with the logged in user.
-    Returns a dictionary with all nessesary information
+    Return the dictionary shown on the home page for a Student whose user is loaded,
+    given the number of students they are following
     '''
     respD = {}      # Create dictionary
-    # Get student object 
-    student = Student.objects.get(user=request.user)
     # Add information to dict
-    respD['firstname'] = request.user.first_name
-    respD['lastname'] = request.user.last_name
-    nb_following = student.following.all().count()
+    respD['firstname'] = student.user.first_name
+    respD['lastname'] = student.user.last_name
     respD['following'] = nb_following
     # Check completion percentage
     completion = 20
-    if student.major is not '': completion += 16
-    if student.minor is not'': completion += 16
-    if student.fav_classes is not '': completion += 16
-    if student.mood is not '': completion += 16
-    if student.bio is not '': completion += 16
+    if student.major != '': completion += 16
+    if student.minor != '': completion += 16
+    if student.fav_classes != '': completion += 16
+    if student.mood != '': completion += 16
+    if student.bio != '': completion += 16
     respD['profileCompletion'] = completion
     respD['daysUntilEnd'] = 4
-    respD['imgUrl'] = Student.objects.get(user=request.user).profile_url
-    # Return the JSON response
-    return JsonResponse(respD)
+    respD['imgUrl'] = student.profile_url
+    return respD
+
+# Get user information
+def get_user_info(request):
+    '''
+    Retreive all user information about the Student object associated with the logged in user.
+    Returns a dictionary with all nessesary information
+    '''
+    # Get student object 
+    student = request.student
+    # Return the JSON response, with the following counter kept by coursematchapp.counters
+    return JsonResponse(user_info_dict(student, student.following_count))
 
 # Register a new user
 def register_user(request):
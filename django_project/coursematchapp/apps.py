@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class CoursematchappConfig(AppConfig):
     name = 'coursematchapp'
+
+    def ready(self):
+        # Connect the signal handlers that maintain the class rosters and response cache
+        from . import signals
+        # Connect the handler that applies the SQLite pragmas of the database profile
+        from django_project import dbprofile
@@ -0,0 +1,103 @@
+from django.db import transaction
+from coursematch_auth.models import Student
+from coursematchapp.models import Course, Class, Change
+from coursematchapp.changelog import record_changes
+
+# Sections a student is enrolled in when adding a course
+DEFAULT_SECTIONS = ['CO1', 'TO1', 'LO1']
+OPERATIONS = ('add_course', 'remove_course', 'switch_section', 'follow', 'unfollow')
+
+
+class BatchError(Exception):
+    '''
+    Raised when an operation of a batch cannot be applied, with the index of the operation
+    '''
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+
+
+# Apply a list of enrollment and follow operations
+@transaction.atomic
+def apply_operations(student, operations):
+    '''
+    Apply operations such as { op: 'add_course', code: String }, { op: 'remove_course', code },
+    { op: 'switch_section', code, section }, { op: 'follow', username } and
+    { op: 'unfollow', username } in order, all or nothing. Everything the operations need is
+    read up front in one transaction, the operations are played on sets in memory and the differences are
+    written with one bulk insert and one bulk delete per relationship. Raises BatchError
+    without writing anything if an operation is invalid.
+    '''
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise BatchError(index, 'Unknown operation')
+    codes = {op.get('code', '') for op in operations if op['op'] in ('add_course', 'remove_course', 'switch_section')}
+    usernames = {op.get('username', '') for op in operations if op['op'] in ('follow', 'unfollow')}
+
+    # Read the current state and everything the operations refer to
+    known_courses = set(Course.objects.filter(code__in=codes).values_list('code', flat=True)) if codes else set()
+    sections, kinds = {}, {}
+    if codes:
+        for cls in Class.objects.filter(course_id__in=codes).values('id', 'course_id', 'kind', 'section'):
+            sections[(cls['course_id'], cls['section'])] = cls['id']
+            kinds[cls['id']] = cls['kind']
+    class_info = {class_id: key for key, class_id in sections.items()}
+    students = dict(Student.objects.filter(user__username__in=usernames).values_list('user__username', 'pk')) if usernames else {}
+    courses = set(student.courses.values_list('code', flat=True))
+    classes = set(student.classes.filter(course_id__in=codes).values_list('id', flat=True)) if codes else set()
+    following = set(student.following.values_list('pk', flat=True)) if usernames else set()
+    old_courses, old_classes, old_following = set(courses), set(classes), set(following)
+
+    # Play the operations in memory
+    for index, op in enumerate(operations):
+        if op['op'] in ('follow', 'unfollow'):
+            if op.get('username', '') not in students:
+                raise BatchError(index, 'Unknown student')
+            if op['op'] == 'follow':
+                following.add(students[op['username']])
+            else:
+                following.discard(students[op['username']])
+            continue
+        code = op.get('code', '')
+        if code not in known_courses:
+            raise BatchError(index, 'Unknown course')
+        in_course = {class_id for class_id in classes if class_info[class_id][0] == code}
+        if op['op'] == 'add_course':
+            if code in courses:
+                raise BatchError(index, 'You are already enrolled in this course')
+            courses.add(code)
+            classes |= {sections[(code, section)] for section in DEFAULT_SECTIONS if (code, section) in sections}
+        elif op['op'] == 'remove_course':
+            courses.discard(code)
+            classes -= in_course
+        else:
+            new_class = sections.get((code, op.get('section', '')))
+            if code not in courses:
+                raise BatchError(index, 'You are not enrolled in this course')
+            if new_class is None:
+                raise BatchError(index, 'Unknown section')
+            classes -= {class_id for class_id in in_course if kinds[class_id] == kinds[new_class]}
+            classes.add(new_class)
+
+    # Write the differences
+    if courses - old_courses:
+        student.courses.add(*(courses - old_courses))
+    if old_courses - courses:
+        student.courses.remove(*(old_courses - courses))
+    if classes - old_classes:
+        student.classes.add(*(classes - old_classes))
+    if old_classes - classes:
+        student.classes.remove(*(old_classes - classes))
+    if following - old_following:
+        student.following.add(*(following - old_following))
+    if old_following - following:
+        student.following.remove(*(old_following - following))
+    names = {pk: username for username, pk in students.items()}
+    # Courses kept with other sections, added and removed courses are logged as such
+    switched = {class_info[class_id][0] for class_id in classes ^ old_classes} - (courses ^ old_courses)
+    record_changes(student.pk, [(Change.COURSE_ADDED, code) for code in sorted(courses - old_courses)]
+                   + [(Change.COURSE_REMOVED, code) for code in sorted(old_courses - courses)]
+                   + [(Change.SECTION_SWITCHED, code) for code in sorted(switched)]
+                   + [(Change.FOLLOWED, names[pk]) for pk in sorted(following - old_following)]
+                   + [(Change.UNFOLLOWED, names[pk]) for pk in sorted(old_following - following)])
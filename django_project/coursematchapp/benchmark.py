@@ -0,0 +1,373 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, URLPattern, URLResolver
+from coursematch_auth.models import Student
+from coursematchapp.models import Course, Class
+from coursematchapp.synthetic import PASSWORD
+from coursematchapp.encoding import record_serialization
+from coursematchapp.feed import broker
+from django_project.asgihandler import build_environ
+
+# Read heavy endpoints compared between the WSGI and ASGI handlers
+SERVER_ENDPOINTS = [
+    'coursematchapp-search_courses',
+    'coursematchapp-search_profiles',
+    'coursematchapp-get_following',
+    'coursematchapp-get_user_courses',
+]
+
+# Get every named URL of the project
+def url_names(patterns=None, prefix=''):
+    '''
+    Return a dictionary mapping the name of every URL in the project's urls.py files to its path,
+    leaving out the URLs that take arguments
+    '''
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = {}
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names.update(url_names(pattern.url_patterns, prefix + str(pattern.pattern)))
+        elif isinstance(pattern, URLPattern) and pattern.name and not pattern.pattern.converters:
+            names[pattern.name] = '/' + prefix + str(pattern.pattern)
+    return names
+
+# Describe the request made to every endpoint
+def endpoint_requests(student):
+    '''
+    Return a dictionary mapping every URL name to (method, data, mutates) for a benchmark run
+    as the given Student, where method is 'get', 'post' or 'json' and data is a function
+    of the iteration number returning the query parameters, form fields or JSON body
+    '''
+    enrolled = sorted(student.courses.values_list('code', flat=True))
+    other_course = Course.objects.exclude(code__in=enrolled).order_by('code').values_list('code', flat=True).first()
+    following = sorted(student.following.values_list('user__username', flat=True))
+    not_following = (Student.objects.exclude(pk=student.pk).exclude(user__username__in=following)
+                     .order_by('pk').values_list('user__username', flat=True).first())
+    sections = [{'code': cls.course_id, 'section': cls.section}
+                for cls in Class.objects.filter(course_id__in=enrolled[:3])]
+    return {
+        'coursematch_auth-login_user': ('json', lambda i: {'username': student.user.username, 'password': PASSWORD}, True),
+        'coursematch_auth-is_auth': ('get', lambda i: {}, False),
+        'coursemath_auth-get_user_info': ('get', lambda i: {}, False),
+        'coursematch_auth-register_user': ('json', lambda i: {
+            'firstname': 'Bench', 'lastname': 'Mark', 'username': 'benchmark{}'.format(i),
+            'password': PASSWORD, 'confirm': PASSWORD}, True),
+        'coursematch_auth-logout_user': ('get', lambda i: {}, True),
+        'coursematchapp-bootstrap': ('get', lambda i: {}, False),
+        'coursematchapp-get_profile_info': ('get', lambda i: {}, False),
+        'coursematchapp-save_profile_info': ('json', lambda i: {
+            'major': 'Computer Science', 'minor': 'Mathematics', 'year': 2, 'gpa': 3.5,
+            'favclasses': 'COMPSCI 1XA3', 'mood': 'Busy', 'bio': 'Benchmark run {}'.format(i)}, True),
+        'coursematchapp-get_user_courses': ('post', lambda i: {'code': ''}, False),
+        'coursematchapp-search_courses': ('get', lambda i: {'code': 'MATH'}, False),
+        'coursematchapp-popular_courses': ('get', lambda i: {}, False),
+        'coursematchapp-search_profiles': ('get', lambda i: {'query': 'Ch'}, False),
+        'coursematchapp-add_course': ('post', lambda i: {'code': other_course}, True),
+        'coursematchapp-check_conflicts': ('json', lambda i: {'sections': sections}, False),
+        'coursematchapp-remove_course': ('post', lambda i: {'code': enrolled[0]}, True),
+        'coursematchapp-batch': ('json', lambda i: {'operations': [
+            {'op': 'add_course', 'code': other_course},
+            {'op': 'remove_course', 'code': enrolled[0]},
+            {'op': 'follow', 'username': not_following}]}, True),
+        'coursematchapp-follow_user': ('post', lambda i: {'username': not_following}, True),
+        'coursematchapp-get_following': ('post', lambda i: {'query': ''}, False),
+        'coursematchapp-match': ('get', lambda i: {}, False),
+        'coursematchapp-get_classmates': ('get', lambda i: {}, False),
+        'coursematchapp-changes': ('get', lambda i: {'since': 0}, False),
+        'coursematchapp-feed': ('get', lambda i: {}, False),
+        'coursematchapp-get_cache_stats': ('get', lambda i: {}, False),
+        'coursematchapp-unfollow_student': ('post', lambda i: {'username': following[0]}, True),
+        'coursematchapp-unfollow_all': ('get', lambda i: {}, True),
+        'coursematchapp-update_picture': ('get', lambda i: {'url': 'profile2.svg'}, True),
+        'metrics': ('get', lambda i: {}, False),
+    }
+
+# Get a percentile of a sorted list
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+# Make one request with the test client
+def send(client, path, method, data):
+    if method == 'get':
+        response = client.get(path, data)
+    elif method == 'post':
+        response = client.post(path, data)
+    else:
+        response = client.post(path, json.dumps(data), content_type='application/json')
+    if response.streaming and response['Content-Type'] == 'text/event-stream':
+        # Event streams never end, read the first event
+        content = next(iter(response.streaming_content))
+        response.close()
+    else:
+        # Read streamed responses completely
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+    return response, content
+
+# Benchmark every endpoint
+def run_benchmarks(client, requests, iterations=20, cold=False):
+    '''
+    Request every URL of the project 'iterations' times with the logged in client and return
+    a dictionary mapping each URL name to its latency percentiles in milliseconds, SQL query
+    counts, response size and time spent encoding JSON. Every request runs in a transaction that is rolled back, so
+    each iteration sees the same data. With cold=True the cache is cleared before every request.
+    '''
+    results = {}
+    for name, path in sorted(url_names().items()):
+        method, data, mutates = requests[name]
+        times, queries, serialize = [], [], []
+        for i in range(iterations):
+            if cold:
+                cache.clear()
+            cookies = client.cookies
+            client.cookies = type(cookies)(cookies)
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured, record_serialization() as encoded:
+                    begin = time.perf_counter()
+                    response, content = send(client, path, method, data(i))
+                    times.append((time.perf_counter() - begin) * 1000)
+                transaction.set_rollback(True)
+            # Undo what the request did to the session and to cached data
+            client.cookies = cookies
+            if mutates:
+                cache.clear()
+            queries.append(len(captured))
+            serialize.append(encoded['seconds'] * 1000)
+        times.sort()
+        queries.sort()
+        serialize.sort()
+        results[name] = {
+            'path': path,
+            'method': method,
+            'status': response.status_code,
+            'iterations': iterations,
+            'mean_ms': sum(times) / len(times),
+            'p50_ms': percentile(times, 0.5),
+            'p90_ms': percentile(times, 0.9),
+            'p99_ms': percentile(times, 0.99),
+            'max_ms': times[-1],
+            'queries': percentile(queries, 0.5),
+            'max_queries': queries[-1],
+            'bytes': len(content),
+            'serialize_ms': percentile(serialize, 0.5),
+        }
+    return results
+
+# Compare two benchmark runs
+def compare_results(old, new, threshold=0.2):
+    '''
+    Return a list of (name, message) for every endpoint whose median latency or response
+    size grew by more than the threshold fraction or that runs more queries than in the old results
+    '''
+    regressions = []
+    for name, result in sorted(new.items()):
+        before = old.get(name)
+        if before is None:
+            continue
+        if result['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            regressions.append((name, 'p50 {:.2f}ms -> {:.2f}ms'.format(before['p50_ms'], result['p50_ms'])))
+        if result['queries'] > before['queries']:
+            regressions.append((name, 'queries {} -> {}'.format(before['queries'], result['queries'])))
+        if result['bytes'] > before.get('bytes', result['bytes']) * (1 + threshold):
+            regressions.append((name, 'bytes {} -> {}'.format(before['bytes'], result['bytes'])))
+    return regressions
+
+# Describe the requests sent straight to the WSGI and ASGI handlers
+def server_requests(requests, cookies):
+    '''
+    Return a list of ASGI (scope, body) pairs for the SERVER_ENDPOINTS, given the descriptions
+    of endpoint_requests and the cookies of a logged in client
+    '''
+    names = url_names()
+    return [asgi_request(names[name], *requests[name][:2], cookies) for name in SERVER_ENDPOINTS]
+
+# Describe one request sent straight to the ASGI handler
+def asgi_request(path, method, data, cookies, i=0):
+    '''
+    Return the ASGI (scope, body) pair of a request described like in endpoint_requests
+    '''
+    cookie = '; '.join('{}={}'.format(key, morsel.value) for key, morsel in cookies.items())
+    headers = [(b'host', b'testserver'), (b'cookie', cookie.encode('latin-1'))]
+    query, body = b'', b''
+    if method == 'get':
+        query = urlencode(data(i)).encode()
+    elif method == 'post':
+        body = urlencode(data(i)).encode()
+        headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+    else:
+        body = json.dumps(data(i)).encode()
+        headers.append((b'content-type', b'application/json'))
+    if body:
+        headers.append((b'content-length', str(len(body)).encode()))
+    scope = {'type': 'http', 'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80),
+             'client': ('127.0.0.1', 0), 'method': 'GET' if method == 'get' else 'POST',
+             'path': path, 'query_string': query, 'headers': headers}
+    return scope, body
+
+# Summarize the latencies of a throughput run
+def throughput_result(latencies, seconds):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': seconds,
+        'requests_per_second': len(latencies) / seconds,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+# Measure the throughput of a WSGI application served by a pool of threads
+def wsgi_throughput(application, requests, workers, total):
+    '''
+    Send 'total' requests, cycling through the (scope, body) pairs, to the WSGI application from
+    'workers' threads, like a threaded WSGI server, and return the throughput and latencies
+    '''
+    def call(i):
+        scope, body = requests[i % len(requests)]
+        begin = time.perf_counter()
+        result = application(build_environ(scope, body), lambda status, headers, exc_info=None: None)
+        try:
+            b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return time.perf_counter() - begin
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(call, range(total)))
+    return throughput_result(latencies, time.perf_counter() - start)
+
+# Measure the throughput of an ASGI application
+def asgi_throughput(application, requests, clients, total):
+    '''
+    Send 'total' requests, cycling through the (scope, body) pairs, to the ASGI application from
+    'clients' concurrent connections on one event loop and return the throughput and latencies
+    '''
+    latencies = []
+    counter = iter(range(total))
+
+    async def call(scope, body):
+        received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            return received.pop() if received else {'type': 'http.disconnect'}
+
+        async def send(message):
+            pass
+        await application(dict(scope), receive, send)
+
+    async def client():
+        for i in counter:
+            begin = time.perf_counter()
+            await call(*requests[i % len(requests)])
+            latencies.append(time.perf_counter() - begin)
+
+    async def run():
+        await asyncio.gather(*(client() for _ in range(clients)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return throughput_result(latencies, time.perf_counter() - start)
+
+# Measure the delivery of feed events to many idle connections
+def feed_load(application, feeds, writes, connections, idle=0, timeout=10):
+    '''
+    Open 'connections' feed streams to the ASGI application on one event loop, cycling
+    through the (scope, body) pairs of feeds, leave them idle for 'idle' seconds, then send
+    the (scope, body) pairs of writes one at a time, each waiting up to timeout seconds for
+    its first event to reach every connection. Return the time taken to open the streams,
+    the threads in use while they are open, the heartbeats and events received and the
+    latencies of the writes and of the delivery of their first event.
+    '''
+    counts = {'events': 0, 'heartbeats': 0}
+    opened = set()
+    closed = asyncio.Event()
+    # Connections still waiting for the first event of the current write, sent at written[0]
+    waiting = set()
+    written = [0.0]
+    delivered = asyncio.Event()
+    delivery = []
+
+    async def stream(index, scope, body):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await closed.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            chunk = message.get('body', b'')
+            if chunk.startswith(b'retry:'):
+                opened.add(index)
+            elif chunk.startswith(b':'):
+                counts['heartbeats'] += 1
+            elif chunk:
+                # Every event ends with a blank line
+                counts['events'] += chunk.count(b'\n\n')
+                if index in waiting:
+                    waiting.discard(index)
+                    delivery.append(time.perf_counter() - written[0])
+                    if not waiting:
+                        delivered.set()
+        await application(dict(scope), receive, send)
+
+    async def call(scope, body):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            return messages.pop() if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            pass
+        await application(dict(scope), receive, send)
+
+    async def run():
+        result = {'connections': connections}
+        begin = time.perf_counter()
+        streams = [asyncio.ensure_future(stream(i, *feeds[i % len(feeds)])) for i in range(connections)]
+        while len(opened) < connections:
+            ended = [task for task in streams if task.done()]
+            if ended:
+                ended[0].result()
+                raise RuntimeError('A feed stream ended before sending its ready event')
+            await asyncio.sleep(0.01)
+        result['open_seconds'] = time.perf_counter() - begin
+        await asyncio.sleep(idle)
+        result['threads'] = threading.active_count()
+        result['subscriptions'] = broker.connections()
+
+        write_latencies = []
+        for scope, body in writes:
+            waiting.update(range(connections))
+            delivered.clear()
+            written[0] = time.perf_counter()
+            await call(scope, body)
+            write_latencies.append(time.perf_counter() - written[0])
+            try:
+                await asyncio.wait_for(delivered.wait(), timeout)
+            except asyncio.TimeoutError:
+                waiting.clear()
+        write_latencies.sort()
+        delivery.sort()
+        result['writes'] = len(write_latencies)
+        result['write_p50_ms'] = percentile(write_latencies, 0.5) * 1000 if write_latencies else None
+        result['delivered'] = len(delivery)
+        result['delivery_p50_ms'] = percentile(delivery, 0.5) * 1000 if delivery else None
+        result['delivery_p99_ms'] = percentile(delivery, 0.99) * 1000 if delivery else None
+
+        closed.set()
+        await asyncio.gather(*streams)
+        result.update(counts)
+        result['subscriptions_after'] = broker.connections()
+        return result
+
+    return asyncio.run(run())
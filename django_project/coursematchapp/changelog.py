@@ -0,0 +1,56 @@
+from django.db.models import Q
+from coursematch_auth.models import Student
+from coursematchapp.models import Change
+
+# Lists of the home page each kind of change affects, for the student who made it and for
+# the students who follow them
+OWN_LISTS = {
+    Change.COURSE_ADDED: 'courses',
+    Change.COURSE_REMOVED: 'courses',
+    Change.FOLLOWED: 'following',
+    Change.UNFOLLOWED: 'following',
+    Change.PROFILE_UPDATED: 'profile',
+    Change.SECTION_SWITCHED: 'courses',
+}
+FOLLOWER_KINDS = (Change.COURSE_ADDED, Change.COURSE_REMOVED, Change.PROFILE_UPDATED, Change.SECTION_SWITCHED)
+FOLLOW_KINDS = (Change.FOLLOWED, Change.UNFOLLOWED)
+
+# Append changes to the log
+def record_changes(student_id, changes):
+    '''
+    Write a Change for every (kind, target) pair made by a student, in one insert. Call it
+    inside the transaction that makes the changes so that both are committed or neither is.
+    '''
+    Change.objects.bulk_create([Change(student_id=student_id, kind=kind, target=target) for kind, target in changes])
+
+# Get the changes a student needs to sync
+def changes_since(student, since, until, limit):
+    '''
+    Return up to 'limit' changes with a sequence number after 'since' and up to 'until' that
+    affect what the student sees: their own changes, course and profile changes of the students they follow,
+    and follows and unfollows of them by other students. Each change is a dictionary with
+    the seq, username, kind, target and time, along with the set of lists they affect.
+    '''
+    following = Student.following.through.objects.filter(from_student_id=student.pk).values('to_student_id')
+    relevant = (Q(student_id=student.pk)
+                | Q(student_id__in=following, kind__in=FOLLOWER_KINDS)
+                | Q(kind__in=FOLLOW_KINDS, target=student.user.get_username()))
+    rows = (Change.objects.filter(relevant, id__gt=since, id__lte=until)
+            .values('id', 'student_id', 'student__user__username', 'kind', 'target', 'created')
+            .order_by('id')[:limit])
+    changes, lists = [], set()
+    for row in rows:
+        changes.append({
+            'seq': row['id'],
+            'username': row['student__user__username'],
+            'kind': row['kind'],
+            'target': row['target'],
+            'time': row['created'],
+        })
+        # Changes by others show up in the following list
+        lists.add(OWN_LISTS[row['kind']] if row['student_id'] == student.pk else 'following')
+    return changes, lists
+
+# Get the newest sequence number
+def latest_seq():
+    return Change.objects.order_by('-id').values_list('id', flat=True).first() or 0
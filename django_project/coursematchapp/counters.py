@@ -0,0 +1,55 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from coursematch_auth.models import Student
+from coursematchapp.models import Course, Class
+
+# Largest number of values passed to a single IN query
+QUERY_CHUNK_SIZE = 500
+
+# Counter column of every model, with the through table and field of the rows it counts.
+# Following is symmetrical, so the students a student follows are also their followers.
+COUNTERS = {
+    Course: ('student_count', Student.courses.through, 'course'),
+    Class: ('student_count', Student.classes.through, 'class'),
+    Student: ('following_count', Student.following.through, 'from_student'),
+}
+
+# Count the through rows pointing at each row of an outer query
+def count_rows(through, field):
+    count = (through.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+             .annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(count, output_field=IntegerField()), Value(0))
+
+# Set counters from the through table
+def recount_rows(rows, column, through, field):
+    '''
+    Set the counter column of every row of the queryset to its number of rows in the through
+    table in a single UPDATE, and return the number of updated rows
+    '''
+    return rows.update(**{column: count_rows(through, field)})
+
+# Recount the counters of some or all rows of a model
+def recount(model, ids=None):
+    column, through, field = COUNTERS[model]
+    if ids is None:
+        return recount_rows(model.objects.all(), column, through, field)
+    ids = list(ids)
+    # Stay under the limit of query parameters of SQLite
+    return sum(recount_rows(model.objects.filter(pk__in=ids[i:i + QUERY_CHUNK_SIZE]), column, through, field)
+               for i in range(0, len(ids), QUERY_CHUNK_SIZE))
+
+# Add to the counters of some rows of a model
+def increment(model, ids, amount=1):
+    column = COUNTERS[model][0]
+    model.objects.filter(pk__in=list(ids)).update(**{column: F(column) + amount})
+
+# Find the rows whose counter is wrong
+def drifted(model):
+    column, through, field = COUNTERS[model]
+    return list(model.objects.annotate(actual=count_rows(through, field)).exclude(**{column: F('actual')})
+                .values_list('pk', flat=True))
+
+# Recount every counter
+def recount_all():
+    for model in COUNTERS:
+        recount(model)
@@ -0,0 +1,82 @@
+import json
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Types the fast encoders do not know about are converted like DjangoJSONEncoder does
+_django_encoder = DjangoJSONEncoder()
+
+def dumps_json(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+def dumps_orjson(data):
+    return orjson.dumps(data, default=_django_encoder.default)
+
+ENCODERS = {
+    'json': dumps_json,
+    'orjson': dumps_orjson,
+}
+
+# Get the JSON encoder chosen in the settings
+def encoder_name():
+    '''
+    Return the name of the encoder in ENCODERS for settings.JSON_ENCODER, which is 'json',
+    'orjson' or 'auto' for orjson when it is installed and the json module otherwise
+    '''
+    name = getattr(settings, 'JSON_ENCODER', 'auto')
+    if name == 'auto':
+        name = 'json' if orjson is None else 'orjson'
+    return name
+
+def get_encoder():
+    return ENCODERS[encoder_name()]
+
+# Time spent encoding, while record_serialization is in use
+_recorders = []
+
+@contextmanager
+def record_serialization():
+    '''
+    Context manager yielding a dictionary that accumulates the number of dumps calls, the
+    seconds spent in them and the bytes they produced inside the block
+    '''
+    recorder = {'calls': 0, 'seconds': 0.0, 'bytes': 0}
+    _recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorders.remove(recorder)
+
+# Encode data to JSON
+def dumps(data):
+    '''
+    Return data encoded as compact JSON bytes with the configured encoder
+    '''
+    if not _recorders:
+        return get_encoder()(data)
+    start = time.perf_counter()
+    content = get_encoder()(data)
+    elapsed = time.perf_counter() - start
+    for recorder in _recorders:
+        recorder['calls'] += 1
+        recorder['seconds'] += elapsed
+        recorder['bytes'] += len(content)
+    return content
+
+
+class JsonResponse(HttpResponse):
+    '''
+    Same as django.http.JsonResponse, encoding with the configured encoder
+    '''
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,217 @@
+import asyncio
+import threading
+from collections import defaultdict, deque
+from django.http import StreamingHttpResponse
+from coursematchapp.encoding import dumps
+
+# Seconds without events after which a comment is sent, which keeps proxies from closing
+# idle connections and lets the server notice clients that went away
+HEARTBEAT_SECONDS = 15
+# Events waiting to be sent on one connection, past which the connection is told to resync
+QUEUE_SIZE = 100
+# Milliseconds browsers wait before reconnecting to a closed stream
+RETRY_MS = 3000
+
+# Kinds of events besides the Change kinds for courses and profiles
+SECTION_ADDED = 'section_added'
+SECTION_REMOVED = 'section_removed'
+
+
+# Encode an event of the stream
+def format_event(kind, data):
+    return 'event: {}\ndata: {}\n\n'.format(kind, dumps(data).decode()).encode()
+
+HEARTBEAT = b': heartbeat\n\n'
+
+# Set asyncio events from their loop
+def set_events(events):
+    for event in events:
+        event.set()
+
+
+class Subscription:
+    '''
+    Encoded events waiting to be sent to one connection of the feed of a student. Events are
+    put by the threads committing changes and taken by the thread or the event loop sending them.
+    '''
+    def __init__(self, broker, student_id, maxsize):
+        self.broker = broker
+        self.student_id = student_id
+        self.maxsize = maxsize
+        self.events = deque()
+        self.overflowed = False
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        # Event loop waiting for events and the asyncio event it waits on
+        self.loop = None
+        self.woken = None
+
+    def put(self, event):
+        '''
+        Queue an encoded event and return the asyncio event to set in self.loop, if any
+        '''
+        with self.lock:
+            if len(self.events) >= self.maxsize:
+                self.overflowed = True
+            else:
+                self.events.append(event)
+        self.ready.set()
+        return self.woken
+
+    def drain(self):
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+            self.ready.clear()
+        return events
+
+    def get(self, timeout):
+        '''
+        Return the waiting events, after waiting up to timeout seconds for one to be put
+        '''
+        self.ready.wait(timeout)
+        return self.drain()
+
+    async def aget(self, timeout):
+        '''
+        Same as get, waiting in the running event loop instead of blocking a thread
+        '''
+        if self.woken is None:
+            self.loop = asyncio.get_running_loop()
+            self.woken = asyncio.Event()
+        deadline = self.loop.time() + timeout
+        # Wakeups of events drained by a previous call come late, keep waiting after them
+        while not self.ready.is_set() and self.loop.time() < deadline:
+            self.woken.clear()
+            timer = self.loop.call_later(deadline - self.loop.time(), self.woken.set)
+            try:
+                await self.woken.wait()
+            finally:
+                timer.cancel()
+        return self.drain()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    '''
+    In-process publish and subscribe of the changes of students to the connected students
+    who follow them. Only the connections of the same process are reached.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Subscriptions of every connected student and subscriptions watching every student
+        self.subscriptions = defaultdict(set)
+        self.watchers = defaultdict(set)
+        self.watching = {}
+
+    def subscribe(self, student_id, following, maxsize=None):
+        subscription = Subscription(self, student_id, maxsize or QUEUE_SIZE)
+        following = set(following)
+        with self.lock:
+            self.subscriptions[student_id].add(subscription)
+            self.watching[subscription] = following
+            for followed_id in following:
+                self.watchers[followed_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.student_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.student_id, None)
+            for followed_id in self.watching.pop(subscription, ()):
+                self.unwatch(subscription, followed_id)
+
+    def unwatch(self, subscription, followed_id):
+        watchers = self.watchers.get(followed_id, set())
+        watchers.discard(subscription)
+        if not watchers:
+            self.watchers.pop(followed_id, None)
+
+    def follow(self, student_id, followed_ids):
+        with self.lock:
+            for subscription in self.subscriptions.get(student_id, ()):
+                for followed_id in followed_ids:
+                    self.watching[subscription].add(followed_id)
+                    self.watchers[followed_id].add(subscription)
+
+    def unfollow(self, student_id, followed_ids):
+        with self.lock:
+            for subscription in self.subscriptions.get(student_id, ()):
+                for followed_id in followed_ids:
+                    self.watching[subscription].discard(followed_id)
+                    self.unwatch(subscription, followed_id)
+
+    def is_watched(self, student_id):
+        return student_id in self.watchers
+
+    def publish(self, student_id, event):
+        '''
+        Send an event to the connections watching a student, encoding it once and waking
+        every event loop once
+        '''
+        with self.lock:
+            subscriptions = list(self.watchers.get(student_id, ()))
+        if not subscriptions:
+            return
+        encoded = format_event(event['kind'], event)
+        woken = defaultdict(list)
+        for subscription in subscriptions:
+            event = subscription.put(encoded)
+            if event is not None:
+                woken[subscription.loop].append(event)
+        for loop, events in woken.items():
+            loop.call_soon_threadsafe(set_events, events)
+
+    def connections(self):
+        with self.lock:
+            return len(self.watching)
+
+broker = Broker()
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    '''
+    Server-sent events of a Subscription. The stream starts with a ready event holding the
+    seq to pass to changes/ to catch up, and ends with a resync event when the client reads
+    too slowly to keep up. Under WSGI the stream holds a thread, under django_project.asgi
+    async_stream sends it from the event loop instead.
+    '''
+    def __init__(self, subscription, seq):
+        self.subscription = subscription
+        self.seq = seq
+        super().__init__(self.stream(), content_type='text/event-stream')
+        self['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the events
+        self['X-Accel-Buffering'] = 'no'
+
+    def ready_event(self):
+        return 'retry: {}\n'.format(RETRY_MS).encode() + format_event('ready', {'seq': self.seq})
+
+    def resync_event(self):
+        return format_event('resync', {})
+
+    def stream(self):
+        yield self.ready_event()
+        while True:
+            events = self.subscription.get(HEARTBEAT_SECONDS)
+            if self.subscription.overflowed:
+                yield self.resync_event()
+                return
+            yield b''.join(events) if events else HEARTBEAT
+
+    async def async_stream(self):
+        yield self.ready_event()
+        while True:
+            events = await self.subscription.aget(HEARTBEAT_SECONDS)
+            if self.subscription.overflowed:
+                yield self.resync_event()
+                return
+            yield b''.join(events) if events else HEARTBEAT
+
+    def close(self):
+        self.subscription.close()
+        super().close()
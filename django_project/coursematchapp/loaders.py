@@ -0,0 +1,79 @@
+from django.db.models import Q
+from coursematchapp.models import Course, Class, LECTURE, TUTORIAL, LAB
+
+# Keys used for each kind of class in a serialized course
+CLASS_KINDS = (
+    (LECTURE, 'lecture'),
+    (TUTORIAL, 'tutorial'),
+    (LAB, 'lab'),
+)
+KIND_NAMES = dict(CLASS_KINDS)
+
+# Serialize a single class
+def class_dict(row):
+    '''
+    Return the dictionary sent to the client for a class, given a values() row of a Class
+    '''
+    return {
+        'section': row['section'],
+        'prof': row['prof'],
+        'location': row['location'],
+        'times': row['times']
+    }
+
+# Get the courses of many students at once
+def load_courses(students, query=''):
+    '''
+    Return a dictionary mapping each student's id to their list of courses, where the course
+    code or department contains the query string. Runs two queries no matter how many students
+    or courses there are: one for the enrolled courses and one for the enrolled classes.
+    '''
+    student_ids = [getattr(student, 'pk', student) for student in students]
+    coursesD = {student_id: [] for student_id in student_ids}
+    if not student_ids:
+        return coursesD
+
+    # Enrolled classes grouped by (student, course), keeping the first class of each kind
+    enrolled = {}
+    for row in (Class.objects.filter(student__in=student_ids)
+                .values('student', 'course_id', 'kind', 'section', 'prof', 'location', 'times')
+                .order_by('id')):
+        kind = KIND_NAMES.get(row['kind'])
+        if kind is None:
+            continue
+        classesD = enrolled.setdefault((row['student'], row['course_id']), {})
+        classesD.setdefault(kind, class_dict(row))
+
+    # Enrolled courses matching the query
+    for row in (Course.objects.filter(student__in=student_ids)
+                .filter(Q(code__icontains=query) | Q(department__icontains=query))
+                .values('student', 'code', 'department')
+                .order_by('code')):
+        classesD = enrolled.get((row['student'], row['code']), {})
+        courseD = {}
+        courseD['code'] = row['code']
+        courseD['department'] = row['department']
+        for letter, kind in CLASS_KINDS:
+            courseD[kind] = classesD.get(kind)
+        coursesD[row['student']].append(courseD)
+    return coursesD
+
+# Get every section of many courses at once
+def load_sections(course_codes):
+    '''
+    Return a dictionary mapping each course code to its lectures, tutorials and labs.
+    Runs a single query with the sections already ordered by the database.
+    '''
+    sectionsD = {code: {'lectures': [], 'tutorials': [], 'labs': []} for code in course_codes}
+    if not sectionsD:
+        return sectionsD
+    # Ordered by section number, which the (course, kind, ordinal) index covers
+    classes = (Class.objects.filter(course_id__in=list(sectionsD))
+               .values('course_id', 'kind', 'section', 'prof', 'location', 'times')
+               .order_by('course_id', 'kind', 'ordinal', 'id'))
+    for row in classes:
+        kind = KIND_NAMES.get(row['kind'])
+        if kind is None:
+            continue
+        sectionsD[row['course_id']][kind + 's'].append(class_dict(row))
+    return sectionsD
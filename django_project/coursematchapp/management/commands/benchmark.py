@@ -0,0 +1,91 @@
+import json
+import platform
+import subprocess
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from coursematchapp.benchmark import endpoint_requests, run_benchmarks, compare_results
+from coursematchapp.encoding import encoder_name
+from coursematchapp.synthetic import generate_university
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every endpoint of the project on a synthetic university created in a '
+            'fresh test database, and print or save latency percentiles and SQL query counts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument('--lectures', type=int, default=2, help='Lectures per course')
+        parser.add_argument('--tutorials', type=int, default=3, help='Tutorials per course')
+        parser.add_argument('--labs', type=int, default=2, help='Labs per course')
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--enrollments', type=int, default=5, help='Courses per student')
+        parser.add_argument('--follows', type=int, default=10, help='Students followed by each student')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Compare with the JSON results of an earlier run')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Latency increase reported as a regression, as a fraction')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        dataset = {key: options[key] for key in ('courses', 'lectures', 'tutorials', 'labs', 'students',
+                                                 'enrollments', 'follows', 'seed')}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            students = generate_university(**dataset)
+            self.stdout.write('Generated data set in {:.1f}s'.format(time.perf_counter() - start))
+            if not students:
+                raise CommandError('The benchmark needs at least one student')
+            student = students[0]
+            client = Client()
+            client.force_login(student.user)
+            results = run_benchmarks(client, endpoint_requests(student), options['iterations'], options['cold'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write('{:<36} {:>6} {:>9} {:>9} {:>9} {:>8} {:>9} {:>9}'.format(
+            'endpoint', 'status', 'p50 ms', 'p90 ms', 'p99 ms', 'queries', 'bytes', 'json ms'))
+        for name, result in results.items():
+            self.stdout.write('{:<36} {:>6} {:>9.2f} {:>9.2f} {:>9.2f} {:>8} {:>9} {:>9.3f}'.format(
+                name, result['status'], result['p50_ms'], result['p90_ms'], result['p99_ms'],
+                result['queries'], result['bytes'], result['serialize_ms']))
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'commit': self.git_commit(),
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'json_encoder': encoder_name(),
+                    'iterations': options['iterations'],
+                    'cold': options['cold'],
+                    'dataset': dataset,
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+
+        if options['compare']:
+            with open(options['compare']) as previous:
+                regressions = compare_results(json.load(previous)['results'], results, options['threshold'])
+            for name, message in regressions:
+                self.stdout.write(self.style.WARNING('Regression in {}: {}'.format(name, message)))
+            if regressions and options['fail_on_regression']:
+                raise CommandError('{} regressions'.format(len(regressions)))
+
+    def git_commit(self):
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
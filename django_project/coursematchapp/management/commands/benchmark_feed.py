@@ -0,0 +1,73 @@
+import json
+from unittest import mock
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from coursematchapp.benchmark import asgi_request, feed_load, url_names
+from coursematchapp.models import Course
+from coursematchapp.synthetic import generate_university
+from django_project.asgihandler import ASGIHandler
+
+
+class Command(BaseCommand):
+    help = ('Open many idle feed/ streams to the ASGI handler on one event loop, in a synthetic '
+            'university created in a fresh test database, and measure the threads they use and the '
+            'delivery of the events of a followed student changing courses to all of them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--threads', type=int, default=8, help='Threads of the ASGI thread pool')
+        parser.add_argument('--connections', type=int, default=2000, help='Feed streams kept open')
+        parser.add_argument('--followers', type=int, default=100,
+                            help='Students the streams are opened for, who all follow the same student')
+        parser.add_argument('--writes', type=int, default=20, help='Course changes made by the followed student')
+        parser.add_argument('--idle', type=float, default=3, help='Seconds the streams stay idle before the writes')
+        parser.add_argument('--heartbeat', type=float, default=1, help='Seconds between heartbeats')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            students = generate_university(courses=options['courses'], students=options['students'], seed=options['seed'])
+            followers = students[1:options['followers'] + 1]
+            if not followers:
+                raise CommandError('The benchmark needs at least two students')
+            writer = students[0]
+            writer.following.add(*followers)
+            paths = url_names()
+            feeds = []
+            for student in followers:
+                client = Client()
+                client.force_login(student.user)
+                feeds.append(asgi_request(paths['coursematchapp-feed'], 'get', lambda i: {}, client.cookies))
+            client = Client()
+            client.force_login(writer.user)
+            code = Course.objects.exclude(student=writer).order_by('code').values_list('code', flat=True).first()
+            writes = [asgi_request(paths['coursematchapp-add_course' if i % 2 == 0 else 'coursematchapp-remove_course'],
+                                   'post', lambda i: {'code': code}, client.cookies) for i in range(options['writes'])]
+
+            asgi = ASGIHandler(get_wsgi_application(), options['threads'])
+            with mock.patch('coursematchapp.feed.HEARTBEAT_SECONDS', options['heartbeat']):
+                result = feed_load(asgi, feeds, writes, options['connections'], idle=options['idle'])
+            asgi.executor.shutdown(wait=True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write('{} streams of {} students opened in {:.2f}s, {} threads running'.format(
+            result['connections'], len(followers), result['open_seconds'], result['threads']))
+        self.stdout.write('{} heartbeats and {} events received, {} subscriptions left after closing'.format(
+            result['heartbeats'], result['events'], result['subscriptions_after']))
+        self.stdout.write('{} writes: p50 {:.2f}ms, first event delivered {} times: p50 {:.2f}ms, p99 {:.2f}ms'.format(
+            result['writes'], result['write_p50_ms'] or 0, result['delivered'],
+            result['delivery_p50_ms'] or 0, result['delivery_p99_ms'] or 0))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'options': {key: options[key] for key in ('courses', 'students', 'seed', 'threads', 'connections',
+                                                                     'followers', 'writes', 'idle', 'heartbeat')},
+                           'result': result}, output, indent=2, sort_keys=True)
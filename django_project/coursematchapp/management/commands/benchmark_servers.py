@@ -0,0 +1,60 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from coursematchapp.benchmark import (endpoint_requests, server_requests, wsgi_throughput, asgi_throughput,
+                                      SERVER_ENDPOINTS)
+from coursematchapp.synthetic import generate_university
+from django_project.asgihandler import ASGIHandler
+
+
+class Command(BaseCommand):
+    help = ('Compare the throughput of the WSGI handler served by a pool of threads with the ASGI '
+            'handler using the same number of threads, on the read heavy endpoints of a synthetic '
+            'university created in a fresh test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Threads of the WSGI server and of the ASGI thread pool')
+        parser.add_argument('--clients', type=int, default=32, help='Concurrent ASGI connections')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests sent to each handler')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            students = generate_university(courses=options['courses'], students=options['students'], seed=options['seed'])
+            if not students:
+                raise CommandError('The benchmark needs at least one student')
+            client = Client()
+            client.force_login(students[0].user)
+            requests = server_requests(endpoint_requests(students[0]), client.cookies)
+
+            wsgi = get_wsgi_application()
+            asgi = ASGIHandler(wsgi, options['workers'])
+            # Warm up the caches so both handlers see the same state
+            wsgi_throughput(wsgi, requests, 1, len(requests))
+            results = {
+                'wsgi': wsgi_throughput(wsgi, requests, options['workers'], options['requests']),
+                'asgi': asgi_throughput(asgi, requests, options['clients'], options['requests']),
+            }
+            asgi.executor.shutdown(wait=True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write('Endpoints: {}'.format(', '.join(SERVER_ENDPOINTS)))
+        self.stdout.write('{:<6} {:>8} {:>10} {:>9} {:>9}'.format('server', 'requests', 'req/s', 'p50 ms', 'p99 ms'))
+        for name, result in results.items():
+            self.stdout.write('{:<6} {:>8} {:>10.1f} {:>9.2f} {:>9.2f}'.format(
+                name, result['requests'], result['requests_per_second'], result['p50_ms'], result['p99_ms']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'options': {key: options[key] for key in ('courses', 'students', 'seed', 'workers', 'clients', 'requests')},
+                           'results': results}, output, indent=2, sort_keys=True)
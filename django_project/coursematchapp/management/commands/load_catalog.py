@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from coursematch_auth.models import Student
+from coursematchapp.changelog import record_changes
+from coursematchapp.models import Course, Class, Change
+from coursematchapp.responsecache import bump_catalog_version
+
+# Class fields that are copied from the catalog file
+CLASS_FIELDS = ['prof', 'location', 'times']
+# Largest number of values passed to a single IN query
+QUERY_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Load the course catalog from a CSV or JSON file with one section per row and the '
+            'columns course, department, section, prof, location and times. Courses are matched '
+            'by code and sections by course and section code.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'],
+                            help='File format, guessed from the file extension by default')
+        parser.add_argument('--mode', choices=['merge', 'replace'], default='merge',
+                            help='replace also deletes the sections of the loaded courses that are not in the file')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Number of rows written per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print the changes without writing them')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.counts = dict.fromkeys(['rows', 'courses_created', 'courses_updated',
+                                     'classes_created', 'classes_updated', 'classes_deleted'], 0)
+        seen = {}   # Sections in the file for every course, used by replace mode
+        # Courses and sections a dry run would have created in earlier batches
+        self.planned_courses, self.planned_classes = {}, {}
+        start = time.perf_counter()
+
+        batch = []
+        for row in self.read_rows(options['path'], options['format']):
+            batch.append(row)
+            seen.setdefault(row['course'], set()).add(row['section'])
+            if len(batch) == options['batch_size']:
+                self.load_batch(batch)
+                batch = []
+        self.load_batch(batch)
+        if options['mode'] == 'replace':
+            self.delete_missing(seen)
+        if not self.dry_run:
+            # Bulk writes do not send signals, so make cached catalog results stale here
+            bump_catalog_version()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            '{prefix}{rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s): '
+            '{courses_created} courses created, {courses_updated} updated; '
+            '{classes_created} sections created, {classes_updated} updated, {classes_deleted} deleted'.format(
+                prefix='[dry run] ' if self.dry_run else '', elapsed=elapsed,
+                rate=self.counts['rows'] / elapsed if elapsed else 0, **self.counts))
+
+    def read_rows(self, path, file_format):
+        '''
+        Yield every row of the catalog file as a dictionary, reading the file as a stream
+        for CSV and JSON lines
+        '''
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip('.').lower()
+            file_format = {'ndjson': 'jsonl'}.get(file_format, file_format)
+        if file_format not in ('csv', 'json', 'jsonl'):
+            raise CommandError('Cannot guess the format of {}, use --format'.format(path))
+        with open(path, newline='', encoding='utf-8') as catalog:
+            if file_format == 'csv':
+                rows = csv.DictReader(catalog)
+            elif file_format == 'jsonl':
+                rows = (json.loads(line) for line in catalog if line.strip())
+            else:
+                rows = json.load(catalog)
+            for line, row in enumerate(rows, 1):
+                yield self.clean_row(row, line)
+
+    def clean_row(self, row, line):
+        cleaned = {key: (row.get(key) or '').strip() for key in ['course', 'department', 'section'] + CLASS_FIELDS}
+        if cleaned['course'] == '' or cleaned['section'] == '':
+            raise CommandError('Row {} is missing a course or section'.format(line))
+        return cleaned
+
+    def load_batch(self, rows):
+        '''
+        Upsert the courses and sections of a batch of rows in a single transaction
+        '''
+        if not rows:
+            return
+        with transaction.atomic():
+            codes = {row['course'] for row in rows}
+            # Upsert courses by code
+            courses = Course.objects.in_bulk(list(codes))
+            if self.dry_run:
+                # Nothing was written for the earlier batches, look up what they would have created
+                courses.update({code: self.planned_courses[code] for code in codes if code in self.planned_courses})
+            new_courses, changed_courses = {}, {}
+            for row in rows:
+                course = courses.get(row['course']) or new_courses.get(row['course'])
+                if course is None:
+                    new_courses[row['course']] = Course(code=row['course'], department=row['department'])
+                    self.log('+ course {}'.format(row['course']))
+                elif row['department'] and course.department != row['department']:
+                    self.log('~ course {}: department {!r} -> {!r}'.format(course.code, course.department, row['department']))
+                    course.department = row['department']
+                    if course.code in courses:
+                        changed_courses[course.code] = course
+            # Upsert sections by course and section code
+            classes = {}
+            codes = list(codes)
+            for i in range(0, len(codes), QUERY_CHUNK_SIZE):
+                for cls in Class.objects.filter(course_id__in=codes[i:i + QUERY_CHUNK_SIZE]):
+                    classes[(cls.course_id, cls.section)] = cls
+            if self.dry_run:
+                for key in {(row['course'], row['section']) for row in rows} & set(self.planned_classes):
+                    classes[key] = self.planned_classes[key]
+            new_classes, changed_classes = {}, {}
+            for row in rows:
+                key = (row['course'], row['section'])
+                cls = classes.get(key) or new_classes.get(key)
+                if cls is None:
+                    new_classes[key] = Class(course_id=row['course'], section=row['section'],
+                                             **{field: row[field] for field in CLASS_FIELDS})
+                    self.log('+ section {}-{}'.format(*key))
+                    continue
+                changes = [field for field in CLASS_FIELDS if getattr(cls, field) != row[field]]
+                if changes:
+                    self.log('~ section {}-{}: {}'.format(key[0], key[1], ', '.join(
+                        '{} {!r} -> {!r}'.format(field, getattr(cls, field), row[field]) for field in changes)))
+                    for field in changes:
+                        setattr(cls, field, row[field])
+                    if key in classes:
+                        changed_classes[key] = cls
+
+            if not self.dry_run:
+                # bulk writes skip Class.save, so parse the section and meeting times here
+                for cls in list(new_classes.values()) + list(changed_classes.values()):
+                    cls.parse_section()
+                    cls.parse_times()
+                Course.objects.bulk_create(new_courses.values())
+                Course.objects.bulk_update(changed_courses.values(), ['department'])
+                Class.objects.bulk_create(new_classes.values())
+                Class.objects.bulk_update(changed_classes.values(), CLASS_FIELDS + ['meetings', 'time_mask'])
+            else:
+                self.planned_courses.update(new_courses)
+                self.planned_classes.update(new_classes)
+        self.counts['rows'] += len(rows)
+        self.counts['courses_created'] += len(new_courses)
+        self.counts['courses_updated'] += len(changed_courses)
+        self.counts['classes_created'] += len(new_classes)
+        self.counts['classes_updated'] += len(changed_classes)
+
+    def delete_missing(self, seen):
+        '''
+        Delete the sections of the loaded courses that were not in the file
+        '''
+        codes = list(seen)
+        with transaction.atomic():
+            stale = []
+            for i in range(0, len(codes), QUERY_CHUNK_SIZE):
+                for cls in Class.objects.filter(course_id__in=codes[i:i + QUERY_CHUNK_SIZE]).only('course', 'section'):
+                    if cls.section not in seen[cls.course_id]:
+                        self.log('- section {}-{}'.format(cls.course_id, cls.section))
+                        stale.append(cls)
+            if not self.dry_run:
+                self.unenroll(stale)
+                for i in range(0, len(stale), QUERY_CHUNK_SIZE):
+                    Class.objects.filter(pk__in=[cls.pk for cls in stale[i:i + QUERY_CHUNK_SIZE]]).delete()
+        self.counts['classes_deleted'] += len(stale)
+
+    def unenroll(self, classes):
+        '''
+        Take the students out of sections about to be deleted. Deleting the sections would
+        remove their enrolments without m2m signals, leaving the cached rosters and course
+        lists, the feeds and the student counters behind, and nothing in the change log.
+        '''
+        enrolled = {}
+        for i in range(0, len(classes), QUERY_CHUNK_SIZE):
+            rows = (Student.classes.through.objects.filter(class_id__in=[cls.pk for cls in classes[i:i + QUERY_CHUNK_SIZE]])
+                    .values_list('class_id', 'student_id'))
+            for class_id, student_id in rows:
+                enrolled.setdefault(class_id, []).append(student_id)
+        switched = {}
+        for cls in classes:
+            if cls.pk in enrolled:
+                cls.student_set.remove(*enrolled[cls.pk])
+                for student_id in enrolled[cls.pk]:
+                    switched.setdefault(student_id, set()).add(cls.course_id)
+        # The students keep the courses, only their sections changed
+        for student_id, course_codes in switched.items():
+            record_changes(student_id, [(Change.SECTION_SWITCHED, code) for code in sorted(course_codes)])
+
+    def log(self, message):
+        # Individual changes are listed for dry runs or with --verbosity 2
+        if self.dry_run or self.verbosity > 1:
+            self.stdout.write(message)
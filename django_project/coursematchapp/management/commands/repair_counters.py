@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from coursematch_auth.middleware import forget_students
+from coursematch_auth.models import Student
+from coursematchapp import counters
+
+
+class Command(BaseCommand):
+    help = ('Find the student counters of courses and classes and the following counters of '
+            'students that do not match the through tables, after writes that bypassed the '
+            'signals such as raw SQL or bulk inserts, and recount them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report the wrong counters, and exit with status 1 if there are any')
+
+    def handle(self, *args, **options):
+        wrong = 0
+        for model, (column, through, field) in counters.COUNTERS.items():
+            start = time.perf_counter()
+            with transaction.atomic():
+                ids = counters.drifted(model)
+                if ids and not options['check']:
+                    counters.recount(model, ids)
+            if ids and model is Student and not options['check']:
+                # Logged in students are cached with their counter
+                forget_students(ids)
+            wrong += len(ids)
+            self.stdout.write('{}.{}: {} wrong{} in {:.2f}s'.format(
+                model.__name__, column, len(ids), ', recounted' if ids and not options['check'] else '',
+                time.perf_counter() - start))
+        if options['check'] and wrong:
+            raise SystemExit(1)
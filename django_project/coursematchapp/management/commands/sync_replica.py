@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django_project.dbprofile import REPLICA
+
+
+class Command(BaseCommand):
+    help = ('Copy the default SQLite database to the replica database file with the online '
+            'backup API, without blocking writers for more than a page at a time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Number of pages copied per step, -1 to copy everything in one step')
+
+    def handle(self, *args, **options):
+        if REPLICA not in connections.databases:
+            raise CommandError('No replica database is configured, set COURSEMATCH_DB_REPLICA')
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('sync_replica only works with SQLite')
+        name = connections.databases[REPLICA]['NAME']
+        # Close the replica connection of this process while its file is rewritten
+        connections[REPLICA].close()
+
+        start = time.perf_counter()
+        source.ensure_connection()
+        # Copy to a temporary file and swap it in, so readers never see a partial copy
+        temporary = name + '.sync'
+        target = sqlite3.connect(temporary)
+        try:
+            source.connection.backup(target, pages=options['pages'])
+            # The copy keeps a rollback journal so that it is a single self-contained file
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+        os.replace(temporary, name)
+        # Connections opened during the copy would keep reading the replaced file. The catalog
+        # version row is copied with the catalog, so no cached response needs invalidating.
+        connections[REPLICA].close()
+        self.stdout.write('Copied {} to {} in {:.2f}s'.format(
+            source.settings_dict['NAME'], name, time.perf_counter() - start))
@@ -0,0 +1,47 @@
+from coursematch_auth.models import Student
+from coursematchapp.models import Class
+
+# Through tables of the Student relationships
+StudentCourse = Student.courses.through
+StudentClass = Student.classes.through
+
+# Match a student's schedule against everyone they follow
+def match_following(student):
+    '''
+    Return a list with, for every student the given student is following, the courses and
+    exact sections they share, best matches first. Runs a fixed number of queries however
+    many students are followed: overlap is computed with set intersections in Python.
+    '''
+    following = list(student.following.select_related('user'))
+    follow_ids = [follow.pk for follow in following]
+    # The student's own courses and sections, which bound every possible match
+    my_classes = {row['id']: row for row in Class.objects.filter(student=student).values('id', 'course_id', 'section')}
+    my_courses = set(StudentCourse.objects.filter(student_id=student.pk).values_list('course_id', flat=True))
+
+    # Courses and sections of the followed students that the student is also in
+    shared_courses = {follow_id: set() for follow_id in follow_ids}
+    shared_classes = {follow_id: set() for follow_id in follow_ids}
+    if follow_ids and my_courses:
+        for follow_id, course_id in (StudentCourse.objects
+                                     .filter(student_id__in=follow_ids, course_id__in=my_courses)
+                                     .values_list('student_id', 'course_id')):
+            shared_courses[follow_id].add(course_id)
+    if follow_ids and my_classes:
+        for follow_id, class_id in (StudentClass.objects
+                                    .filter(student_id__in=follow_ids, class_id__in=list(my_classes))
+                                    .values_list('student_id', 'class_id')):
+            shared_classes[follow_id].add(class_id)
+
+    matches = []
+    for follow in following:
+        sections = sorted((my_classes[class_id]['course_id'], my_classes[class_id]['section'])
+                          for class_id in shared_classes[follow.pk])
+        matches.append({
+            'uname': follow.user.get_username(),
+            'fullname': follow.user.get_full_name(),
+            'imgUrl': follow.profile_url,
+            'sharedCourses': sorted(shared_courses[follow.pk]),
+            'sharedSections': [{'code': code, 'section': section} for code, section in sections],
+        })
+    matches.sort(key=lambda m: (-len(m['sharedSections']), -len(m['sharedCourses']), m['uname']))
+    return matches
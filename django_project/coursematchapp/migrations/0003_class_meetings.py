@@ -0,0 +1,129 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:58
+
+import re
+from django.db import migrations, models
+
+# Frozen copy of coursematchapp.schedule as of this migration, so that later changes to the
+# parsing do not change what it does
+
+# Days of the week as used in Class.times, Monday is day 0
+DAYS = {
+    'm': 0, 'mo': 0, 'mon': 0, 'monday': 0,
+    't': 1, 'tu': 1, 'tue': 1, 'tues': 1, 'tuesday': 1,
+    'w': 2, 'we': 2, 'wed': 2, 'weds': 2, 'wednesday': 2,
+    'r': 3, 'th': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3,
+    'f': 4, 'fr': 4, 'fri': 4, 'friday': 4,
+    'sa': 5, 'sat': 5, 'saturday': 5,
+    'su': 6, 'sun': 6, 'sunday': 6,
+}
+
+# Length of a class when the times only give a start time
+DEFAULT_LENGTH = 50
+# Size of a slot in the weekly grid, in minutes
+SLOT_MINUTES = 10
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+TIME_RE = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?', re.I)
+RANGE_RE = re.compile(TIME_RE.pattern + r'\s*-\s*' + TIME_RE.pattern, re.I)
+
+# Convert a clock time to minutes after midnight
+def to_minutes(hour, minute, suffix):
+    '''
+    Return the minutes after midnight for a time such as 8:30 or 2:30 pm. Without an am/pm
+    suffix, hours from 1 to 7 are afternoon classes and 8 to 12 are morning or noon classes.
+    '''
+    hour = int(hour)
+    minute = int(minute or 0)
+    if suffix:
+        suffix = suffix[0].lower()
+        if suffix == 'p' and hour < 12:
+            hour += 12
+        elif suffix == 'a' and hour == 12:
+            hour = 0
+    elif 1 <= hour < 8:
+        hour += 12
+    return hour * 60 + minute
+
+# Parse the free text meeting times of a class
+def parse_times(times):
+    '''
+    Return a sorted list of (day, start, end) meetings from a times string such as
+    '8:30 Mon-Wed, 12:30 Thurs' or '2:30-4:20 pm Tues', where day is 0 for Monday and
+    start and end are minutes after midnight. Groups that cannot be parsed are skipped.
+    '''
+    meetings = set()
+    for group in times.split(','):
+        match = RANGE_RE.search(group)
+        if match is not None:
+            end_suffix = match.group(6)
+            end = to_minutes(match.group(4), match.group(5), end_suffix)
+            start = to_minutes(match.group(1), match.group(2), match.group(3) or end_suffix)
+            if start >= end and not match.group(3):
+                start = to_minutes(match.group(1), match.group(2), 'am')
+        else:
+            match = TIME_RE.search(group)
+            if match is None:
+                continue
+            start = to_minutes(match.group(1), match.group(2), match.group(3))
+            end = start + DEFAULT_LENGTH
+        rest = group[:match.start()] + ' ' + group[match.end():]
+        for word in re.findall(r'[a-z]+', rest.lower()):
+            if word in DAYS:
+                meetings.add((DAYS[word], start, min(end, 24 * 60)))
+    return sorted(meetings)
+
+# Pack meetings into their stored text form
+def encode_meetings(meetings):
+    '''
+    Return meetings as 'day:start-end' tokens separated by spaces, e.g. '0:510-560 2:510-560'
+    '''
+    return ' '.join('{}:{}-{}'.format(day, start, end) for day, start, end in meetings)
+
+# Build the weekly bitmask of a list of meetings
+def meetings_mask(meetings):
+    '''
+    Return an integer with one bit set for every 10 minute slot of the week covered by the
+    meetings, so that two sets of meetings overlap exactly when their masks share a bit
+    '''
+    mask = 0
+    for day, start, end in meetings:
+        first = day * SLOTS_PER_DAY + start // SLOT_MINUTES
+        last = day * SLOTS_PER_DAY + (end + SLOT_MINUTES - 1) // SLOT_MINUTES
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+# Convert a mask to its stored hexadecimal form
+def mask_to_hex(mask):
+    return format(mask, 'x') if mask else ''
+
+
+# Fill in the structured times of the existing classes
+def backfill_meetings(apps, schema_editor):
+    Class = apps.get_model('coursematchapp', 'Class')
+    classes = list(Class.objects.all())
+    for cls in classes:
+        meetings = parse_times(cls.times)
+        cls.meetings = encode_meetings(meetings)
+        cls.time_mask = mask_to_hex(meetings_mask(meetings))
+    Class.objects.bulk_update(classes, ['meetings', 'time_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematchapp', '0002_auto_20190423_0047'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='meetings',
+            field=models.CharField(blank=True, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='time_mask',
+            field=models.CharField(blank=True, max_length=252),
+        ),
+        migrations.RunPython(backfill_meetings, migrations.RunPython.noop),
+    ]
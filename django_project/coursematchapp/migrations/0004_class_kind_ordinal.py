@@ -0,0 +1,56 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:09
+
+import re
+from django.db import migrations, models
+
+# Kind letters of the section codes, frozen as of this migration
+KIND_LETTERS = ('C', 'T', 'L')
+
+
+# Frozen copy of coursematchapp.models.parse_section as of this migration
+def parse_section(section):
+    '''
+    Return the kind letter and the number of a section code, such as ('C', 1) for CO1 and
+    ('T', 10) for T10. The kind is '' and the number 0 when they cannot be found.
+    '''
+    kind = next((letter for letter in KIND_LETTERS if letter in section), '')
+    number = re.search(r'(\d+)$', section)
+    return kind, int(number.group(1)) if number else 0
+
+
+# Fill in the kind and ordinal of the existing classes
+def backfill_sections(apps, schema_editor):
+    Class = apps.get_model('coursematchapp', 'Class')
+    classes = list(Class.objects.all())
+    for cls in classes:
+        cls.kind, cls.ordinal = parse_section(cls.section)
+    Class.objects.bulk_update(classes, ['kind', 'ordinal'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematchapp', '0003_class_meetings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('C', 'Lecture'), ('T', 'Tutorial'), ('L', 'Lab')], db_index=True, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='ordinal',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_sections, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['course', 'kind', 'ordinal'], name='class_course_kind_ordinal'),
+        ),
+        migrations.AddConstraint(
+            model_name='class',
+            constraint=models.UniqueConstraint(fields=('course', 'kind', 'section'), name='unique_class_section'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematch_auth', '0007_studentsearch'),
+        ('coursematchapp', '0004_class_kind_ordinal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course_added', 'Course added'), ('course_removed', 'Course removed'), ('followed', 'Followed'), ('unfollowed', 'Unfollowed'), ('profile_updated', 'Profile updated')], max_length=20)),
+                ('target', models.CharField(blank=True, max_length=150)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='coursematch_auth.Student')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['student', 'id'], name='change_student_id'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['target', 'id'], name='change_target_id'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+# Set a counter column to the number of rows pointing at each row in a through table
+def recount_sql(schema_editor, model, column, through, field):
+    quote = schema_editor.quote_name
+    return 'UPDATE {table} SET {column} = (SELECT COUNT(*) FROM {through} WHERE {through}.{field} = {table}.{pk})'.format(
+        table=quote(model._meta.db_table), column=quote(column), through=quote(through._meta.db_table),
+        field=quote(through._meta.get_field(field).column), pk=quote(model._meta.pk.column))
+
+# Count the students of the existing courses and classes
+def backfill_counters(apps, schema_editor):
+    Student = apps.get_model('coursematch_auth', 'Student')
+    for name, through, field in (('Course', Student.courses.through, 'course'), ('Class', Student.classes.through, 'class')):
+        model = apps.get_model('coursematchapp', name)
+        schema_editor.execute(recount_sql(schema_editor, model, 'student_count', through, field))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematch_auth', '0007_studentsearch'),
+        ('coursematchapp', '0005_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='student_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coursematchapp', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='change',
+            name='kind',
+            field=models.CharField(choices=[('course_added', 'Course added'), ('course_removed', 'Course removed'), ('followed', 'Followed'), ('unfollowed', 'Unfollowed'), ('profile_updated', 'Profile updated'), ('section_switched', 'Section switched')], max_length=20),
+        ),
+    ]
@@ -1,9 +1,33 @@
+import re
 from django.db import models
+from coursematchapp import schedule
+
+# Kinds of class, identified by a letter in the section code (CO1, TO2, LO1)
+LECTURE = 'C'
+TUTORIAL = 'T'
+LAB = 'L'
+KIND_CHOICES = (
+    (LECTURE, 'Lecture'),
+    (TUTORIAL, 'Tutorial'),
+    (LAB, 'Lab'),
+)
+
+# Get the kind and number of a section
+def parse_section(section):
+    '''
+    Return the kind letter and the number of a section code, such as ('C', 1) for CO1 and
+    ('T', 10) for T10. The kind is '' and the number 0 when they cannot be found.
+    '''
+    kind = next((letter for letter, name in KIND_CHOICES if letter in section), '')
+    number = re.search(r'(\d+)$', section)
+    return kind, int(number.group(1)) if number else 0
 
 # Create your models here.
 class Course(models.Model):
     code = models.CharField(max_length=30, primary_key=True)
     department = models.CharField(max_length=30)
+    # Number of enrolled students, kept exact by the signals (see coursematchapp.counters)
+    student_count = models.PositiveIntegerField(default=0, db_index=True)
 
 
 class Class(models.Model):
@@ -12,6 +36,90 @@ class Class(models.Model):
     prof = models.CharField(max_length=60, blank=True)
     location = models.CharField(max_length=40)
     times = models.CharField(max_length=300, blank=True)
+    # Kind and number of the section, kept in sync on save so ordering happens in SQL
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES, blank=True, db_index=True)
+    ordinal = models.PositiveIntegerField(default=0)
+    # Structured form of times, kept in sync on save (see coursematchapp.schedule)
+    meetings = models.CharField(max_length=300, blank=True)
+    time_mask = models.CharField(max_length=252, blank=True)
+    # Number of enrolled students, kept exact by the signals (see coursematchapp.counters)
+    student_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'kind', 'ordinal'], name='class_course_kind_ordinal'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'kind', 'section'], name='unique_class_section'),
+        ]
 
     def __str__(self):
-        return "{}-{}".format(self.course.code, self.section)
\ No newline at end of file
+        return "{}-{}".format(self.course.code, self.section)
+
+    def parse_section(self):
+        '''
+        Update kind and ordinal from the section code
+        '''
+        self.kind, self.ordinal = parse_section(self.section)
+
+    def parse_times(self):
+        '''
+        Update meetings and time_mask from the times text
+        '''
+        meetings = schedule.parse_times(self.times)
+        self.meetings = schedule.encode_meetings(meetings)
+        self.time_mask = schedule.mask_to_hex(schedule.meetings_mask(meetings))
+
+    def save(self, *args, **kwargs):
+        self.parse_section()
+        self.parse_times()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'section' in update_fields:
+            update_fields = set(update_fields) | {'kind', 'ordinal'}
+        if update_fields is not None and 'times' in update_fields:
+            update_fields = set(update_fields) | {'meetings', 'time_mask'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class Change(models.Model):
+    '''
+    Append-only log of the changes made to a student's courses, follows and profile, written
+    in the same transaction as the change. The id is the sequence number clients sync from.
+    '''
+    COURSE_ADDED = 'course_added'
+    COURSE_REMOVED = 'course_removed'
+    FOLLOWED = 'followed'
+    UNFOLLOWED = 'unfollowed'
+    PROFILE_UPDATED = 'profile_updated'
+    SECTION_SWITCHED = 'section_switched'
+    KIND_CHOICES = (
+        (COURSE_ADDED, 'Course added'),
+        (COURSE_REMOVED, 'Course removed'),
+        (FOLLOWED, 'Followed'),
+        (UNFOLLOWED, 'Unfollowed'),
+        (PROFILE_UPDATED, 'Profile updated'),
+        (SECTION_SWITCHED, 'Section switched'),
+    )
+
+    student = models.ForeignKey('coursematch_auth.Student', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Course code or username the change is about, blank for profile updates
+    target = models.CharField(max_length=150, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'id'], name='change_student_id'),
+            models.Index(fields=['target', 'id'], name='change_target_id'),
+        ]
+
+
+class CatalogVersion(models.Model):
+    '''
+    Single row holding the version of the course catalog, bumped in the transaction of every
+    Course or Class write. It is kept in the database rather than the cache so that every
+    process, and every copy of the database, agrees on it.
+    '''
+    version = models.BigIntegerField(default=0)
@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
+from coursematch_auth.models import Student
+from coursematchapp.models import CatalogVersion
+
+# Cached responses expire after this many seconds even without changes
+RESPONSE_TIMEOUT = 60 * 60 * 24
+
+# Hits and misses of every kind of cached response in this process
+_stats = {}
+_stats_lock = threading.Lock()
+
+def record(kind, hit):
+    with _stats_lock:
+        counts = _stats.setdefault(kind, {'hits': 0, 'misses': 0})
+        counts['hits' if hit else 'misses'] += 1
+
+# Get the hit rate of the response cache
+def cache_stats():
+    '''
+    Return the hits, misses and hit rate of every kind of cached response since the
+    process started
+    '''
+    with _stats_lock:
+        stats = {kind: dict(counts) for kind, counts in _stats.items()}
+    for counts in stats.values():
+        total = counts['hits'] + counts['misses']
+        counts['hitRate'] = counts['hits'] / total if total else 0.0
+    return stats
+
+# Cache keys
+def version_key(kind, student_id):
+    return 'coursematch:response:{}:{}:version'.format(kind, student_id)
+
+def response_key(kind, student_id, version, request):
+    params = sorted(request.GET.items()) + sorted(request.POST.items())
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return 'coursematch:response:{}:{}:{}:{}'.format(kind, student_id, version, digest)
+
+def catalog_key(version, *params):
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return 'coursematch:catalog:{}:{}'.format(version, digest)
+
+# Get the current version of a student's cached responses
+def get_version(kind, student_id):
+    '''
+    Return the version of a kind of response for a student. A missing version, never set
+    or evicted, starts from the current time so older entries can never be read again.
+    '''
+    key = version_key(kind, student_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+# Get the version of the course catalog
+def catalog_version():
+    '''
+    Return the current catalog version, which changes on every Course or Class write. It is
+    read from the database the catalog is read from, so a replica gives the version of its copy.
+    '''
+    version = CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return 0 if version is None else version
+
+def bump_catalog_version():
+    '''
+    Bump the catalog version in the current transaction. A missing row, as after flushing
+    the database, starts from the current time so older entries can never be read again.
+    '''
+    if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={'version': int(time.time() * 1000)})
+
+# Invalidate cached responses
+def invalidate(kind, student_ids):
+    '''
+    Make every cached response of a kind for the given students stale by bumping their version
+    '''
+    for student_id in set(student_ids):
+        try:
+            cache.incr(version_key(kind, student_id))
+        except ValueError:
+            cache.set(version_key(kind, student_id), int(time.time() * 1000), None)
+
+# Get the students whose following lists show any of the given students
+def followers_of(student_ids):
+    student_ids = list(student_ids)
+    if not student_ids:
+        return []
+    return list(Student.following.through.objects.filter(to_student_id__in=student_ids)
+                .values_list('from_student_id', flat=True))
+
+# Cache a view's response for the logged in student
+def cached_response(kind, catalog=False):
+    '''
+    Decorate a view so its JSON response is cached per student and per request parameters
+    until the student's data of that kind is invalidated, or the course catalog changes
+    when catalog is True
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            version = get_version(kind, request.user.pk)
+            if catalog:
+                version = '{}.{}'.format(version, catalog_version())
+            key = response_key(kind, request.user.pk, version, request)
+            cached = cache.get(key)
+            record(kind, cached is not None)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), RESPONSE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from coursematch_auth.models import Student
+
+StudentClass = Student.classes.through
+
+# Rosters are rebuilt from the database at least this often, in seconds
+ROSTER_TIMEOUT = 60 * 60
+
+# Cache key of a class roster
+def roster_key(class_id):
+    return 'coursematch:roster:{}'.format(class_id)
+
+# Get the students enrolled in many classes at once
+def get_rosters(class_ids):
+    '''
+    Return a dictionary mapping each class id to the set of ids of the students enrolled in it.
+    Rosters are read from the cache and the missing ones are rebuilt with a single query.
+    '''
+    keys = {roster_key(class_id): class_id for class_id in class_ids}
+    rosters = {keys[key]: roster for key, roster in cache.get_many(list(keys)).items()}
+    missing = [class_id for class_id in class_ids if class_id not in rosters]
+    if missing:
+        built = {class_id: set() for class_id in missing}
+        for student_id, class_id in (StudentClass.objects.filter(class_id__in=missing)
+                                     .values_list('student_id', 'class_id')):
+            built[class_id].add(student_id)
+        cache.set_many({roster_key(class_id): roster for class_id, roster in built.items()}, ROSTER_TIMEOUT)
+        rosters.update(built)
+    return rosters
+
+# Drop cached rosters
+def forget_rosters(class_ids):
+    cache.delete_many([roster_key(class_id) for class_id in class_ids])
@@ -0,0 +1,147 @@
+import re
+
+# Days of the week as used in Class.times, Monday is day 0
+DAYS = {
+    'm': 0, 'mo': 0, 'mon': 0, 'monday': 0,
+    't': 1, 'tu': 1, 'tue': 1, 'tues': 1, 'tuesday': 1,
+    'w': 2, 'we': 2, 'wed': 2, 'weds': 2, 'wednesday': 2,
+    'r': 3, 'th': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3,
+    'f': 4, 'fr': 4, 'fri': 4, 'friday': 4,
+    'sa': 5, 'sat': 5, 'saturday': 5,
+    'su': 6, 'sun': 6, 'sunday': 6,
+}
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# Length of a class when the times only give a start time
+DEFAULT_LENGTH = 50
+# Size of a slot in the weekly grid, in minutes
+SLOT_MINUTES = 10
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+TIME_RE = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?', re.I)
+RANGE_RE = re.compile(TIME_RE.pattern + r'\s*-\s*' + TIME_RE.pattern, re.I)
+
+# Convert a clock time to minutes after midnight
+def to_minutes(hour, minute, suffix):
+    '''
+    Return the minutes after midnight for a time such as 8:30 or 2:30 pm. Without an am/pm
+    suffix, hours from 1 to 7 are afternoon classes and 8 to 12 are morning or noon classes.
+    '''
+    hour = int(hour)
+    minute = int(minute or 0)
+    if suffix:
+        suffix = suffix[0].lower()
+        if suffix == 'p' and hour < 12:
+            hour += 12
+        elif suffix == 'a' and hour == 12:
+            hour = 0
+    elif 1 <= hour < 8:
+        hour += 12
+    return hour * 60 + minute
+
+# Parse the free text meeting times of a class
+def parse_times(times):
+    '''
+    Return a sorted list of (day, start, end) meetings from a times string such as
+    '8:30 Mon-Wed, 12:30 Thurs' or '2:30-4:20 pm Tues', where day is 0 for Monday and
+    start and end are minutes after midnight. Groups that cannot be parsed are skipped.
+    '''
+    meetings = set()
+    for group in times.split(','):
+        match = RANGE_RE.search(group)
+        if match is not None:
+            end_suffix = match.group(6)
+            end = to_minutes(match.group(4), match.group(5), end_suffix)
+            start = to_minutes(match.group(1), match.group(2), match.group(3) or end_suffix)
+            if start >= end and not match.group(3):
+                start = to_minutes(match.group(1), match.group(2), 'am')
+        else:
+            match = TIME_RE.search(group)
+            if match is None:
+                continue
+            start = to_minutes(match.group(1), match.group(2), match.group(3))
+            end = start + DEFAULT_LENGTH
+        rest = group[:match.start()] + ' ' + group[match.end():]
+        for word in re.findall(r'[a-z]+', rest.lower()):
+            if word in DAYS:
+                meetings.add((DAYS[word], start, min(end, 24 * 60)))
+    return sorted(meetings)
+
+# Pack meetings into their stored text form
+def encode_meetings(meetings):
+    '''
+    Return meetings as 'day:start-end' tokens separated by spaces, e.g. '0:510-560 2:510-560'
+    '''
+    return ' '.join('{}:{}-{}'.format(day, start, end) for day, start, end in meetings)
+
+def decode_meetings(text):
+    meetings = []
+    for token in text.split():
+        day, span = token.split(':')
+        start, end = span.split('-')
+        meetings.append((int(day), int(start), int(end)))
+    return meetings
+
+# Build the weekly bitmask of a list of meetings
+def meetings_mask(meetings):
+    '''
+    Return an integer with one bit set for every 10 minute slot of the week covered by the
+    meetings, so that two sets of meetings overlap exactly when their masks share a bit
+    '''
+    mask = 0
+    for day, start, end in meetings:
+        first = day * SLOTS_PER_DAY + start // SLOT_MINUTES
+        last = day * SLOTS_PER_DAY + (end + SLOT_MINUTES - 1) // SLOT_MINUTES
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+# Convert a mask to and from its stored hexadecimal form
+def mask_to_hex(mask):
+    return format(mask, 'x') if mask else ''
+
+def hex_to_mask(text):
+    return int(text, 16) if text else 0
+
+# Format minutes after midnight as a 24 hour clock time
+def format_minutes(minutes):
+    return '{}:{:02d}'.format(minutes // 60, minutes % 60)
+
+# Get the meetings shared by two classes
+def overlap(meetings, other_meetings):
+    '''
+    Return the overlapping parts of two lists of (day, start, end) meetings
+    '''
+    shared = []
+    for day, start, end in meetings:
+        for other_day, other_start, other_end in other_meetings:
+            if day == other_day and start < other_end and other_start < end:
+                shared.append((day, max(start, other_start), min(end, other_end)))
+    return shared
+
+# Find the schedule conflicts of a set of classes
+def find_conflicts(classes, enrolled=()):
+    '''
+    Return a list of conflicts between the given classes and between each of them and the
+    enrolled classes. Classes only need course_id, section, meetings and time_mask attributes;
+    clashes are found with a bitwise AND of the time masks, so meetings are only decoded to
+    describe the conflicts that exist.
+    '''
+    classes = [(cls, hex_to_mask(cls.time_mask)) for cls in classes]
+    enrolled = [(cls, hex_to_mask(cls.time_mask)) for cls in enrolled]
+    conflicts = []
+    for i, (cls, mask) in enumerate(classes):
+        if not mask:
+            continue
+        for other, other_mask in classes[i + 1:] + enrolled:
+            if mask & other_mask:
+                conflicts.append({
+                    'code': cls.course_id,
+                    'section': cls.section,
+                    'withCode': other.course_id,
+                    'withSection': other.section,
+                    'times': [
+                        {'day': DAY_NAMES[day], 'start': format_minutes(start), 'end': format_minutes(end)}
+                        for day, start, end in overlap(decode_meetings(cls.meetings), decode_meetings(other.meetings))
+                    ]
+                })
+    return conflicts
@@ -0,0 +1,222 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.db import transaction
+from django.dispatch import receiver
+from coursematch_auth.models import Student
+from coursematchapp.models import Course, Class, Change
+from coursematchapp import rosters, responsecache, counters
+from coursematch_auth.middleware import forget_students
+from coursematchapp.feed import broker, SECTION_ADDED, SECTION_REMOVED
+
+# Fields of a Student whose changes are pushed to the feed of its followers
+FEED_PROFILE_FIELDS = {'major', 'minor', 'year', 'gpa', 'fav_classes', 'mood', 'bio', 'profile_url'}
+
+# Drop the cached rosters of classes students join or leave, once the transaction commits.
+# Patching them in place would keep students of rolled back writes and lose concurrent updates.
+@receiver(m2m_changed, sender=Student.classes.through)
+def update_rosters(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set:
+        # From student.classes the changed ids are classes, from class.student_set they are students
+        class_ids = [instance.pk] if reverse else list(pk_set)
+    elif action == 'pre_clear':
+        # Remember the classes a student leaves before the rows are gone
+        if not reverse:
+            instance._cleared_classes = list(instance.classes.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        class_ids = [instance.pk] if reverse else getattr(instance, '_cleared_classes', [])
+    else:
+        return
+    if class_ids:
+        transaction.on_commit(lambda: rosters.forget_rosters(class_ids))
+
+
+# Invalidate cached responses once the transaction commits, so that a response read before
+# the commit is never cached under the new version and rolled back writes invalidate nothing
+def invalidate_on_commit(kind, student_ids):
+    student_ids = set(student_ids)
+    if student_ids:
+        transaction.on_commit(lambda: responsecache.invalidate(kind, student_ids))
+
+# The followers are read now, as the transaction sees them
+def invalidate_followers_on_commit(student_ids):
+    invalidate_on_commit('following', responsecache.followers_of(student_ids))
+
+# Invalidate cached profiles when a Student is saved
+@receiver(post_save, sender=Student)
+def invalidate_profile(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_on_commit('profile', [instance.pk])
+    invalidate_followers_on_commit([instance.pk])
+
+# Invalidate the following lists showing a User whose name changed
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_followers_on_commit([instance.pk])
+
+# Invalidate the following lists of a Student's followers before it is deleted
+@receiver(pre_delete, sender=Student)
+def invalidate_deleted(sender, instance, **kwargs):
+    invalidate_followers_on_commit([instance.pk])
+
+# Invalidate cached course lists when students join or leave courses or classes
+@receiver(m2m_changed, sender=Student.courses.through)
+@receiver(m2m_changed, sender=Student.classes.through)
+def invalidate_courses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Remember the students of a course or class before the rows are gone
+        instance._cleared_students = list(instance.student_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        student_ids = [instance.pk]
+    elif action == 'post_clear':
+        student_ids = getattr(instance, '_cleared_students', [])
+    else:
+        student_ids = pk_set or []
+    invalidate_on_commit('courses', student_ids)
+    invalidate_followers_on_commit(student_ids)
+
+# Invalidate the following lists of both students when one follows or unfollows the other
+@receiver(m2m_changed, sender=Student.following.through)
+def invalidate_following(sender, instance, action, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._cleared_following = list(instance.following.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_on_commit('following', [instance.pk] + list(pk_set or []))
+    elif action == 'post_clear':
+        invalidate_on_commit('following', [instance.pk] + getattr(instance, '_cleared_following', []))
+
+# Bump the catalog version on any Course or Class write, in the same transaction
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Class)
+def bump_catalog(sender, **kwargs):
+    responsecache.bump_catalog_version()
+
+# Push events to the feed of the followers of students once the transaction commits
+def publish(student_ids, kind, targets):
+    '''
+    Publish an event of the given kind for every target and every student id, leaving out
+    the students no connection is watching so that writes pay nothing when nobody listens
+    '''
+    student_ids = [student_id for student_id in student_ids if broker.is_watched(student_id)]
+    if not student_ids or not targets:
+        return
+    usernames = dict(User.objects.filter(pk__in=student_ids).values_list('pk', 'username'))
+
+    def send():
+        for student_id in student_ids:
+            for target in targets:
+                broker.publish(student_id, {'username': usernames.get(student_id, ''), 'kind': kind, 'target': target})
+    transaction.on_commit(send)
+
+# Push courses the followed students add or drop
+@receiver(m2m_changed, sender=Student.courses.through)
+def publish_courses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_courses = list(instance.courses.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear') or reverse and action == 'post_clear':
+        return
+    kind = Change.COURSE_ADDED if action == 'post_add' else Change.COURSE_REMOVED
+    if reverse:
+        publish(pk_set, kind, [instance.pk])
+    elif action == 'post_clear':
+        publish([instance.pk], kind, sorted(getattr(instance, '_cleared_courses', [])))
+    else:
+        publish([instance.pk], kind, sorted(pk_set))
+
+# Push sections the followed students join or leave, as "<course> <section>"
+@receiver(m2m_changed, sender=Student.classes.through)
+def publish_sections(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    kind = SECTION_ADDED if action == 'post_add' else SECTION_REMOVED
+    student_ids, class_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    if not any(broker.is_watched(student_id) for student_id in student_ids):
+        return
+    sections = Class.objects.filter(pk__in=class_ids).order_by('course_id', 'kind', 'ordinal')
+    publish(student_ids, kind, ['{} {}'.format(course, section) for course, section in sections.values_list('course_id', 'section')])
+
+# Push profile changes of the followed students
+@receiver(post_save, sender=Student)
+def publish_profile(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created or (update_fields is not None and not FEED_PROFILE_FIELDS & set(update_fields)):
+        return
+    publish([instance.pk], Change.PROFILE_UPDATED, [''])
+
+# Watch the students a connected student starts following, both ways since following is symmetrical
+@receiver(m2m_changed, sender=Student.following.through)
+def update_feed_following(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        followed_ids = set(pk_set or [])
+    elif action == 'post_clear':
+        followed_ids = set(getattr(instance, '_cleared_following', []))
+    else:
+        return
+    update = broker.follow if action == 'post_add' else broker.unfollow
+
+    def apply():
+        update(instance.pk, followed_ids)
+        for followed_id in followed_ids:
+            update(followed_id, [instance.pk])
+    transaction.on_commit(apply)
+
+# Keep the student counters of courses and classes exact. Added ids are always new rows, but
+# removed ids may not have been enrolled, so those counters are recounted.
+@receiver(m2m_changed, sender=Student.courses.through)
+@receiver(m2m_changed, sender=Student.classes.through)
+def count_students(sender, instance, action, reverse, pk_set, **kwargs):
+    model = Course if sender is Student.courses.through else Class
+    if action == 'post_add' and pk_set:
+        if reverse:
+            counters.increment(model, [instance.pk], len(pk_set))
+        else:
+            counters.increment(model, pk_set)
+    elif action == 'post_remove' and pk_set:
+        counters.recount(model, [instance.pk] if reverse else pk_set)
+    elif action == 'post_clear':
+        # The ids of a student's cleared courses and classes are kept by the handlers above
+        cleared = '_cleared_courses' if model is Course else '_cleared_classes'
+        counters.recount(model, [instance.pk] if reverse else getattr(instance, cleared, []))
+
+# Keep the following counters of both students exact when one follows or unfollows the other
+@receiver(m2m_changed, sender=Student.following.through)
+def count_following(sender, instance, action, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        student_ids = [instance.pk] + list(pk_set)
+        counters.increment(Student, [instance.pk], len(pk_set))
+        # The rows of the other direction are only added after this signal, for those missing
+        existing = sender.objects.filter(from_student__in=pk_set, to_student=instance.pk).values_list('from_student', flat=True)
+        counters.increment(Student, set(pk_set) - set(existing))
+    elif action in ('post_remove', 'post_clear'):
+        # Both directions are already removed
+        student_ids = [instance.pk] + list(pk_set or getattr(instance, '_cleared_following', []))
+        counters.recount(Student, student_ids)
+    else:
+        return
+    # Logged in students are cached with their counter, drop them once it is committed
+    transaction.on_commit(lambda: forget_students(student_ids))
+
+# Remember what a Student is counted in, since deleting it removes its rows without m2m signals
+@receiver(pre_delete, sender=Student)
+def remember_counted(sender, instance, **kwargs):
+    instance._counted = {
+        Course: list(instance.courses.values_list('pk', flat=True)),
+        Class: list(instance.classes.values_list('pk', flat=True)),
+        Student: list(instance.following.values_list('pk', flat=True)),
+    }
+
+@receiver(post_delete, sender=Student)
+def recount_deleted(sender, instance, **kwargs):
+    for model, ids in getattr(instance, '_counted', {}).items():
+        if ids:
+            counters.recount(model, ids)
+    followed_ids = getattr(instance, '_counted', {}).get(Student, [])
+    transaction.on_commit(lambda: forget_students(followed_ids))
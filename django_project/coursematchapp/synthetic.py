@@ -0,0 +1,110 @@
+import random
+import string
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from coursematch_auth.models import Student
+from coursematch_auth import search
+from coursematchapp.models import Course, Class
+from coursematchapp.responsecache import bump_catalog_version
+from coursematchapp.counters import recount_all
+
+# Password of every synthetic student
+PASSWORD = 'synthetic-password'
+
+FIRST_NAMES = ['Ava', 'Ben', 'Chloe', 'Daniel', 'Emma', 'Felix', 'Grace', 'Hassan', 'Isla', 'Jun',
+               'Kiran', 'Liam', 'Maya', 'Noah', 'Olivia', 'Priya', 'Quinn', 'Ravi', 'Sofia', 'Theo']
+LAST_NAMES = ['Anderson', 'Brown', 'Chen', 'Das', 'Evans', 'Fischer', 'Garcia', 'Huang', 'Ibrahim',
+              'Johnson', 'Kim', 'Lee', 'Martin', 'Nguyen', 'Obi', 'Patel', 'Singh', 'Tremblay', 'Wong']
+MAJORS = ['Computer Science', 'Software Engineering', 'Mathematics', 'Economics', 'Biology',
+          'Chemistry', 'Physics', 'Psychology', 'Commerce', 'Mechanical Engineering']
+DEPARTMENTS = [('COMPSCI', 'Computer Science'), ('SFWRENG', 'Software Engineering'),
+               ('MATH', 'Mathematics'), ('ECON', 'Economics'), ('BIOLOGY', 'Biology'),
+               ('CHEM', 'Chemistry'), ('PHYSICS', 'Physics'), ('PSYCH', 'Psychology')]
+BUILDINGS = ['JHE', 'BSB', 'TSH', 'HSL', 'MDCL', 'ITB', 'ABB', 'KTH']
+START_TIMES = ['8:30', '9:30', '10:30', '11:30', '12:30', '1:30', '2:30', '3:30', '4:30', '7:00']
+DAY_PATTERNS = ['Mon-Wed', 'Tues Thurs', 'Mon Wed Fri', 'Fri', 'Tues', 'Wed-Fri', 'Thurs']
+KINDS = [('C', 'lectures'), ('T', 'tutorials'), ('L', 'labs')]
+
+# Code of the n-th synthetic course
+def course_code(index):
+    dept_code = DEPARTMENTS[index % len(DEPARTMENTS)][0]
+    number = index // len(DEPARTMENTS)
+    return '{} {}{}{}3'.format(dept_code, 1 + number % 4,
+                               string.ascii_uppercase[number // 4 % 26],
+                               string.ascii_uppercase[number // 104 % 26])
+
+# Code of the n-th section of a kind, the first one being the default CO1, TO1 or LO1
+def section_code(letter, index):
+    return '{}O1'.format(letter) if index == 0 else '{}{:02d}'.format(letter, index + 1)
+
+# Generate a synthetic university
+def generate_university(courses=200, lectures=2, tutorials=3, labs=2, students=1000,
+                        enrollments=5, follows=10, seed=0):
+    '''
+    Bulk create a deterministic data set: courses with the given number of lectures, tutorials
+    and labs each, and students enrolled in 'enrollments' courses (one section of every kind)
+    who each follow 'follows' other students. The same seed always gives the same data.
+    Returns the list of created Students, whose password is PASSWORD.
+    '''
+    rand = random.Random(seed)
+    sizes = {'lectures': lectures, 'tutorials': tutorials, 'labs': labs}
+
+    # Courses and their sections
+    new_courses = [Course(code=course_code(i), department=DEPARTMENTS[i % len(DEPARTMENTS)][1])
+                   for i in range(courses)]
+    Course.objects.bulk_create(new_courses, batch_size=500)
+    new_classes = []
+    for course in new_courses:
+        for letter, kind in KINDS:
+            for i in range(sizes[kind]):
+                cls = Class(course=course, section=section_code(letter, i),
+                            prof='' if letter == 'T' else 'Dr. {}'.format(rand.choice(LAST_NAMES)),
+                            location='{} {}'.format(rand.choice(BUILDINGS), rand.randint(100, 399)),
+                            times='{} {}'.format(rand.choice(START_TIMES), rand.choice(DAY_PATTERNS)))
+                cls.parse_section()
+                cls.parse_times()
+                new_classes.append(cls)
+    Class.objects.bulk_create(new_classes, batch_size=500)
+    # Read back the section ids, filtering in Python to stay clear of query parameter limits
+    codes = {course.code for course in new_courses}
+    sections = {}
+    for cls in Class.objects.values('id', 'course_id', 'kind').order_by('id'):
+        if cls['course_id'] in codes:
+            sections.setdefault((cls['course_id'], cls['kind']), []).append(cls['id'])
+
+    # Students, all sharing one password hash
+    password = make_password(PASSWORD)
+    start = User.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    users = [User(id=start + i + 1, username='student{}'.format(start + i + 1), password=password,
+                  first_name=rand.choice(FIRST_NAMES), last_name=rand.choice(LAST_NAMES))
+             for i in range(students)]
+    User.objects.bulk_create(users, batch_size=500)
+    new_students = [Student(user=user, major=rand.choice(MAJORS), year=rand.randint(1, 4),
+                            gpa=round(rand.uniform(1.0, 4.0), 1), bio='Synthetic student')
+                    for user in users]
+    Student.objects.bulk_create(new_students, batch_size=500)
+
+    # Enrollments and follows, written straight to the through tables
+    course_rows, class_rows, follow_rows = [], [], set()
+    for student in new_students:
+        for course in rand.sample(new_courses, min(enrollments, len(new_courses))):
+            course_rows.append(Student.courses.through(student_id=student.pk, course_id=course.code))
+            for letter, kind in KINDS:
+                if (course.code, letter) in sections:
+                    class_rows.append(Student.classes.through(student_id=student.pk,
+                                                              class_id=rand.choice(sections[(course.code, letter)])))
+        others = [other for other in rand.sample(new_students, min(follows + 1, len(new_students))) if other is not student]
+        for other in others[:follows]:
+            # Following is symmetrical, so both directions are stored
+            follow_rows.add((student.pk, other.pk))
+            follow_rows.add((other.pk, student.pk))
+    Student.courses.through.objects.bulk_create(course_rows, batch_size=500)
+    Student.classes.through.objects.bulk_create(class_rows, batch_size=500)
+    Student.following.through.objects.bulk_create(
+        [Student.following.through(from_student_id=a, to_student_id=b) for a, b in sorted(follow_rows)], batch_size=500)
+
+    # Bulk writes send no signals, so refresh the derived data
+    search.rebuild_index()
+    recount_all()
+    bump_catalog_version()
+    return new_students
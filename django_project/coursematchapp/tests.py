@@ -1,3 +1,920 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.core.wsgi import get_wsgi_application
+from django.http import StreamingHttpResponse
+from django_project import dbprofile, querycheck
+from django_project.asgihandler import ASGIHandler, build_environ
+from coursematch_auth.models import Student
+from coursematchapp.models import Course, Class, Change
+from coursematchapp import counters, encoding, responsecache, schedule
+from coursematchapp.benchmark import (endpoint_requests, run_benchmarks, url_names, server_requests, asgi_throughput,
+                                      asgi_request, feed_load)
+from coursematchapp.feed import Broker, broker
+from coursematchapp.synthetic import generate_university
 
-# Create your tests here.
+# Create a small catalog and a set of enrolled students
+def make_students(nb_students, nb_courses=5):
+    '''
+    Create nb_courses courses with a lecture, tutorial and lab each and nb_students
+    students enrolled in every course with the first section of every kind
+    '''
+    students = []
+    for i in range(nb_courses):
+        course = Course.objects.create(code='COMP {}XA3'.format(i), department='Computer Science')
+        Class.objects.create(course=course, section='CO1', prof='Prof {}'.format(i), location='JHE 327', times='8:30 Mon')
+        Class.objects.create(course=course, section='TO1', location='BSB 107', times='1:30 Wed')
+        Class.objects.create(course=course, section='LO1', location='ITB 236', times='2:30 Fri')
+    for i in range(nb_students):
+        student = Student.objects.create_student('student{}'.format(i), 'password123', 'First{}'.format(i), 'Last{}'.format(i))
+        student.courses.set(Course.objects.all())
+        student.classes.set(Class.objects.all())
+        students.append(student)
+    return students
+
+
+class BatchedCourseLoaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(10)
+        self.student = Student.objects.create_student('viewer', 'password123', 'View', 'Er')
+        self.client.force_login(self.student.user)
+
+    def test_search_profiles_query_count(self):
+        # students + classes + courses, whatever the number of students
+        with self.assertNumQueries(3):
+            resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'First'})
+        data = resp.json()['data']
+        self.assertEqual(len(data), 10)
+        for studentD in data:
+            self.assertEqual(len(studentD['courses']), 5)
+            for courseD in studentD['courses']:
+                self.assertEqual(courseD['lecture']['section'], 'CO1')
+                self.assertEqual(courseD['tutorial']['section'], 'TO1')
+                self.assertEqual(courseD['lab']['section'], 'LO1')
+
+    def test_get_following_loads_followed_courses(self):
+        self.student.following.add(*self.students[:3])
+        self.students[0].courses.clear()
+        # student + catalog version + following + classes + courses
+        with self.assertNumQueries(5):
+            resp = self.client.post('/coursematchapp/getfollowing/', {'query': ''})
+        data = {d['uname']: d for d in resp.json()['data']}
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data['student0']['courses'], [])
+        self.assertEqual(len(data['student1']['courses']), 5)
+
+    def test_search_profiles_fields(self):
+        # Only the students are read when the courses are not requested
+        with self.assertNumQueries(1):
+            resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'First', 'fields': 'uname,imgUrl,unknown'})
+        data = resp.json()['data']
+        self.assertEqual(len(data), 10)
+        self.assertEqual(set(data[0]), {'uname', 'imgUrl'})
+        self.student.following.add(*self.students[:2])
+        resp = self.client.post('/coursematchapp/getfollowing/?fields=fullname,courses', {'query': ''})
+        self.assertEqual([set(d) for d in resp.json()['data']], [{'fullname', 'courses'}] * 2)
+
+    def test_fields_only_join_user_when_needed(self):
+        self.student.following.add(*self.students[:2])
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'First', 'fields': 'info'})
+        self.assertEqual(len(resp.json()['data']), 10)
+        self.assertNotIn('auth_user', queries[-1]['sql'])
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post('/coursematchapp/getfollowing/?fields=info', {'query': ''})
+        self.assertEqual(len(resp.json()['data']), 2)
+        self.assertNotIn('auth_user', queries[-1]['sql'])
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'First', 'fields': 'uname'})
+        self.assertEqual(resp.json()['data'][0], {'uname': 'student0'})
+        self.assertIn('"auth_user"."username"', queries[-1]['sql'])
+        self.assertNotIn('"auth_user"."password"', queries[-1]['sql'])
+
+    def test_search_profiles_ndjson_stream(self):
+        with mock.patch('coursematchapp.views.STREAM_CHUNK_SIZE', 4):
+            resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'First', 'format': 'ndjson'})
+            self.assertTrue(resp.streaming)
+            self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+            # students + (classes + courses) for each of the 3 chunks
+            with self.assertNumQueries(7):
+                lines = b''.join(resp.streaming_content).decode().splitlines()
+        data = [json.loads(line) for line in lines]
+        self.assertEqual(sorted(d['uname'] for d in data), sorted(s.user.username for s in self.students))
+        self.assertEqual(len(data[0]['courses']), 5)
+
+
+class EncoderTests(TestCase):
+    def test_json_encoders(self):
+        data = {'when': datetime.date(2019, 4, 23), 'gpa': 3.5, 'name': 'Zoë'}
+        with self.settings(JSON_ENCODER='json'):
+            content = encoding.dumps(data)
+        self.assertEqual(content, '{"when":"2019-04-23","gpa":3.5,"name":"Zo\\u00eb"}'.encode())
+        if encoding.orjson is not None:
+            with self.settings(JSON_ENCODER='orjson'):
+                self.assertEqual(json.loads(encoding.dumps(data)), json.loads(content))
+
+
+class SearchCoursesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_students(0, nb_courses=7)
+        course = Course.objects.get(code='COMP 0XA3')
+        Class.objects.create(course=course, section='C10', location='BSB 221')
+        Class.objects.create(course=course, section='C02', location='BSB 220')
+        Class.objects.create(course=course, section='TO2', location='BSB 108')
+
+    def test_search_courses_query_count(self):
+        # catalog version + courses + sections, whatever the number of courses
+        with self.assertNumQueries(3):
+            resp = self.client.get('/coursematchapp/searchcourses/', {'code': 'COMP'})
+        data = resp.json()['data']
+        self.assertEqual(len(data), 7)
+        self.assertEqual([lec['section'] for lec in data[0]['lectures']], ['CO1', 'C02', 'C10'])
+        self.assertEqual([tut['section'] for tut in data[0]['tutorials']], ['TO1', 'TO2'])
+        self.assertEqual(len(data[1]['labs']), 1)
+
+    def test_search_courses_cursor(self):
+        codes = []
+        cursor = ''
+        while cursor is not None:
+            resp = self.client.get('/coursematchapp/searchcourses/', {'code': 'COMP', 'limit': 3, 'cursor': cursor}).json()
+            self.assertLessEqual(len(resp['data']), 3)
+            codes += [course['code'] for course in resp['data']]
+            cursor = resp['next']
+        self.assertEqual(codes, sorted(Course.objects.values_list('code', flat=True)))
+
+
+class LoadCatalogTests(TestCase):
+    def load(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as catalog:
+            catalog.write('\n'.join(json.dumps(row) for row in rows))
+        self.addCleanup(os.remove, catalog.name)
+        stdout = io.StringIO()
+        call_command('load_catalog', catalog.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_upsert_and_replace(self):
+        rows = [
+            {'course': 'COMP 1XA3', 'department': 'Computer Science', 'section': 'CO1', 'location': 'JHE 327', 'times': '8:30 Mon'},
+            {'course': 'COMP 1XA3', 'department': 'Computer Science', 'section': 'TO1', 'location': 'BSB 107'},
+        ]
+        self.load(rows)
+        self.assertEqual(Class.objects.count(), 2)
+        self.assertEqual(Class.objects.get(section='TO1').kind, 'T')
+        rows[0]['location'] = 'ITB 137'
+        self.load(rows[:1], '--dry-run')
+        self.assertEqual(Class.objects.get(section='CO1').location, 'JHE 327')
+        self.load(rows[:1], '--mode', 'replace', '--batch-size', '1')
+        self.assertEqual(list(Class.objects.values_list('section', 'location')), [('CO1', 'ITB 137')])
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_invalidates_other_processes(self):
+        rows = [{'course': 'COMP 1XA3', 'department': 'Computer Science', 'section': 'CO1', 'location': 'JHE 327'}]
+        self.load(rows)
+        search = lambda: self.client.get('/coursematchapp/searchcourses/', {'code': 'COMP'}).json()['data']
+        self.assertEqual(search()[0]['lectures'][0]['location'], 'JHE 327')
+        rows[0]['location'] = 'ITB 137'
+        # manage.py runs in its own process, with its own local cache
+        with mock.patch('coursematchapp.responsecache.cache', LocMemCache('load_catalog', {})):
+            self.load(rows)
+        self.assertEqual(search()[0]['lectures'][0]['location'], 'ITB 137')
+
+    def test_dry_run_batches(self):
+        rows = [{'course': 'COMP {}XA3'.format(i), 'department': 'Computer Science', 'section': section}
+                for section in ('CO1', 'TO1') for i in range(3)]
+        with mock.patch('coursematchapp.management.commands.load_catalog.QUERY_CHUNK_SIZE', 2):
+            output = self.load(rows + rows[:1], '--dry-run', '--batch-size', '2')
+        self.assertEqual(output.count('+ course COMP 0XA3'), 1)
+        self.assertEqual(output.count('+ section COMP 0XA3-CO1'), 1)
+        self.assertIn('3 courses created, 0 updated; 6 sections created', output)
+        self.assertEqual(Course.objects.count(), 0)
+
+    def test_replace_unenrolls_students(self):
+        students = make_students(2, nb_courses=2)
+        rows = [{'course': 'COMP 1XA3', 'department': 'Computer Science', 'section': section} for section in ('CO1', 'LO1')]
+        self.load(rows, '--mode', 'replace')
+        self.assertEqual(sorted(students[0].classes.filter(course_id='COMP 1XA3').values_list('section', flat=True)), ['CO1', 'LO1'])
+        self.assertEqual(students[0].classes.count(), 5)
+        self.assertEqual(sorted(Change.objects.values_list('student_id', 'kind', 'target')),
+                         [(student.pk, Change.SECTION_SWITCHED, 'COMP 1XA3') for student in students])
+        self.assertEqual(counters.drifted(Class), [])
+
+
+class ScheduleTests(TestCase):
+    def test_parse_times(self):
+        self.assertEqual(schedule.parse_times('8:30 Mon-Wed, 12:30 Thurs'),
+                         [(0, 510, 560), (2, 510, 560), (3, 750, 800)])
+        self.assertEqual(schedule.parse_times('2:30-4:20 pm Tues'), [(1, 870, 980)])
+        self.assertEqual(schedule.parse_times('TBA'), [])
+
+    def test_class_save_stores_meetings(self):
+        course = Course.objects.create(code='MATH 1ZB3', department='Mathematics')
+        lec = Class.objects.create(course=course, section='CO1', location='TSH 120', times='8:30 Mon-Wed')
+        lec.refresh_from_db()
+        self.assertEqual(lec.meetings, '0:510-560 2:510-560')
+        mask = schedule.hex_to_mask(lec.time_mask)
+        self.assertTrue(mask & schedule.meetings_mask([(2, 540, 590)]))
+        self.assertFalse(mask & schedule.meetings_mask([(2, 560, 610), (1, 510, 560)]))
+
+
+class ConflictTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        math = Course.objects.create(code='MATH 1ZB3', department='Mathematics')
+        comp = Course.objects.create(code='COMP 1XA3', department='Computer Science')
+        Class.objects.create(course=math, section='CO1', location='TSH 120', times='8:30 Mon-Wed')
+        Class.objects.create(course=comp, section='CO1', location='JHE 327', times='8:30 Wed')
+        Class.objects.create(course=comp, section='C02', location='JHE 327', times='9:30 Wed')
+        self.student = Student.objects.create_student('viewer', 'password123', 'View', 'Er')
+        self.client.force_login(self.student.user)
+        self.client.post('/coursematchapp/addcourse/', {'code': 'MATH 1ZB3'})
+
+    def test_add_course_reports_conflicts(self):
+        resp = self.client.post('/coursematchapp/addcourse/', {'code': 'COMP 1XA3', 'format': 'json'}).json()
+        self.assertEqual(resp['status'], 'Course Added')
+        self.assertEqual(resp['conflicts'], [{
+            'code': 'COMP 1XA3', 'section': 'CO1', 'withCode': 'MATH 1ZB3', 'withSection': 'CO1',
+            'times': [{'day': 'Wed', 'start': '8:30', 'end': '9:20'}]
+        }])
+
+    def test_check_conflicts(self):
+        sections = [{'code': 'COMP 1XA3', 'section': 'C02'}, {'code': 'COMP 1XA3', 'section': 'C09'}]
+        resp = self.client.post('/coursematchapp/checkconflicts/', json.dumps({'sections': sections}),
+                                content_type='application/json').json()
+        self.assertEqual(resp['conflicts'], [])
+        self.assertEqual(resp['unknown'], [{'code': 'COMP 1XA3', 'section': 'C09'}])
+        sections[1]['section'] = 'CO1'
+        resp = self.client.post('/coursematchapp/checkconflicts/', json.dumps({'sections': sections}),
+                                content_type='application/json').json()
+        self.assertEqual([(c['section'], c['withCode']) for c in resp['conflicts']], [('CO1', 'MATH 1ZB3')])
+
+
+class MatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(6, nb_courses=3)
+        self.student = self.students[0]
+        self.client.force_login(self.student.user)
+        self.student.following.add(*self.students[1:])
+        # student1 only shares the first course, on a different lecture
+        other = Class.objects.create(course_id='COMP 0XA3', section='C02', location='BSB 220')
+        self.students[1].courses.set(['COMP 0XA3'])
+        self.students[1].classes.set([other])
+
+    def test_match_query_count_and_ranking(self):
+        # student + following + classes + courses + shared courses + shared classes
+        with self.assertNumQueries(6):
+            data = self.client.get('/coursematchapp/match/').json()['data']
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[-1]['uname'], 'student1')
+        self.assertEqual(data[-1]['sharedCourses'], ['COMP 0XA3'])
+        self.assertEqual(data[-1]['sharedSections'], [])
+        self.assertEqual(len(data[0]['sharedCourses']), 3)
+        self.assertEqual(len(data[0]['sharedSections']), 9)
+
+
+class ClassmatesTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(4, nb_courses=1)
+        self.student = self.students[0]
+        self.client.force_login(self.student.user)
+
+    def classmates(self, **params):
+        data = self.client.get('/coursematchapp/getclassmates/', params).json()['data']
+        return {cls['section']: [s['uname'] for s in cls['classmates']] for cls in data}
+
+    def test_rosters_follow_enrollment_changes(self):
+        self.assertEqual(self.classmates()['CO1'], ['student1', 'student2', 'student3'])
+        lecture = Class.objects.get(section='CO1')
+        self.students[1].classes.remove(lecture)
+        lecture.student_set.add(self.students[1])
+        self.students[2].classes.clear()
+        # classes + rosters + classmates, the changed rosters are rebuilt once
+        with self.assertNumQueries(3):
+            result = self.classmates()
+        self.assertEqual(result['CO1'], ['student1', 'student3'])
+        self.assertEqual(result['TO1'], ['student1', 'student3'])
+        # classes + classmates, with the student and every roster read from the cache
+        with self.assertNumQueries(2):
+            self.assertEqual(self.classmates(), result)
+
+    def test_rolled_back_enrollment(self):
+        self.assertEqual(self.classmates()['CO1'], ['student1', 'student2', 'student3'])
+        lecture = Class.objects.get(section='CO1')
+        newcomer = Student.objects.create_student('newcomer', 'password123', 'New', 'Comer')
+        with self.assertRaises(ValueError), transaction.atomic():
+            lecture.student_set.add(newcomer)
+            self.students[1].classes.remove(lecture)
+            raise ValueError
+        self.assertEqual(self.classmates()['CO1'], ['student1', 'student2', 'student3'])
+
+    def test_only_following(self):
+        self.student.following.add(self.students[3])
+        self.assertEqual(self.classmates(following='1', code='COMP 0XA3')['LO1'], ['student3'])
+
+
+class ResponseCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(3, nb_courses=2)
+        self.student = self.students[0]
+        self.student.following.add(self.students[1])
+        self.client.force_login(self.student.user)
+
+    def following_courses(self):
+        data = self.client.post('/coursematchapp/getfollowing/', {'query': ''}).json()['data']
+        return [len(d['courses']) for d in data]
+
+    def test_cached_until_invalidated(self):
+        before = self.client.get('/coursematchapp/cachestats/').json().get('following', {'hits': 0, 'misses': 0})
+        self.assertEqual(self.following_courses(), [2])
+        # session, student and response all cached, only the catalog version is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.following_courses(), [2])
+        # A followed student's changes invalidate the follower's list
+        self.students[1].courses.remove('COMP 0XA3')
+        self.assertEqual(self.following_courses(), [1])
+        self.client.post('/coursematchapp/followuser/', {'username': 'student2'})
+        self.assertEqual(self.following_courses(), [1, 2])
+        self.client.post('/coursematchapp/saveprofileinfo/', json.dumps({'major': 'Physics'}), content_type='application/json')
+        self.assertEqual(self.client.get('/coursematchapp/getprofileinfo/').json()['major'], 'Physics')
+        after = self.client.get('/coursematchapp/cachestats/').json()['following']
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 3))
+
+    def test_rolled_back_writes_keep_cache(self):
+        self.assertEqual(self.following_courses(), [2])
+        before = self.client.get('/coursematchapp/cachestats/').json()['following']
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.students[1].courses.remove('COMP 0XA3')
+            self.student.following.add(self.students[2])
+            raise ValueError
+        self.assertEqual(self.following_courses(), [2])
+        after = self.client.get('/coursematchapp/cachestats/').json()['following']
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 0))
+
+    def test_file_based_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}):
+            self.client.post('/coursematchapp/getusercourses/', {'code': ''})
+            with self.assertNumQueries(1):
+                courses = self.client.post('/coursematchapp/getusercourses/', {'code': ''}).json()['courses']
+            self.assertEqual(len(courses), 2)
+            self.client.post('/coursematchapp/removecourse/', {'code': 'COMP 0XA3'})
+            courses = self.client.post('/coursematchapp/getusercourses/', {'code': ''}).json()['courses']
+            self.assertEqual(len(courses), 1)
+
+
+class CatalogCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        make_students(0, nb_courses=3)
+
+    def test_etag_and_invalidation(self):
+        resp = self.client.get('/coursematchapp/searchcourses/', {'code': 'comp'})
+        etag = resp['ETag']
+        self.assertIn('max-age', resp['Cache-Control'])
+        # Same normalized query: cached, and a 304 when the client has it, reading only the catalog version
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/coursematchapp/searchcourses/', {'code': ' COMP '})['ETag'], etag)
+            resp = self.client.get('/coursematchapp/searchcourses/', {'code': 'comp'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        # Any catalog write changes the version
+        Class.objects.filter(section='CO1').first().delete()
+        resp = self.client.get('/coursematchapp/searchcourses/', {'code': 'comp'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(len(resp.json()['data'][0]['lectures']), 0)
+
+    def test_version_shared_by_processes(self):
+        version = responsecache.catalog_version()
+        # Another process has its own local cache, the version is in the database
+        cache.clear()
+        self.assertEqual(responsecache.catalog_version(), version)
+        Course.objects.create(code='COMP 9XA3', department='Computer Science')
+        self.assertNotEqual(responsecache.catalog_version(), version)
+
+
+class BootstrapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(5, nb_courses=2)
+        self.student = self.students[0]
+        self.student.following.add(*self.students[1:])
+        self.client.force_login(self.student.user)
+
+    def test_bootstrap_matches_separate_endpoints(self):
+        # seq + student + following + classes + courses
+        with self.assertNumQueries(5):
+            data = self.client.get('/coursematchapp/bootstrap/').json()
+        self.assertEqual(data['userInfo'], self.client.get('/coursematchauth/getuserinfo/').json())
+        self.assertEqual(data['profileInfo'], self.client.get('/coursematchapp/getprofileinfo/').json())
+        self.assertEqual(data['courses'], self.client.post('/coursematchapp/getusercourses/', {'code': ''}).json())
+        following = self.client.post('/coursematchapp/getfollowing/', {'query': ''}).json()
+        self.assertEqual(sorted(d['uname'] for d in data['following']['data']), sorted(d['uname'] for d in following['data']))
+        self.assertEqual(data['userInfo']['following'], 4)
+        self.assertEqual(data['seq'], 0)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(3, nb_courses=3)
+        self.student = Student.objects.create_student('viewer', 'password123', 'View', 'Er')
+        Class.objects.create(course_id='COMP 1XA3', section='TO2', location='BSB 108')
+        self.client.force_login(self.student.user)
+
+    def batch(self, *operations):
+        return self.client.post('/coursematchapp/batch/', json.dumps({'operations': operations}),
+                                content_type='application/json')
+
+    def test_build_schedule(self):
+        resp = self.batch(
+            {'op': 'add_course', 'code': 'COMP 0XA3'},
+            {'op': 'add_course', 'code': 'COMP 1XA3'},
+            {'op': 'switch_section', 'code': 'COMP 1XA3', 'section': 'TO2'},
+            {'op': 'add_course', 'code': 'COMP 2XA3'},
+            {'op': 'remove_course', 'code': 'COMP 2XA3'},
+            {'op': 'follow', 'username': 'student0'},
+            {'op': 'follow', 'username': 'student1'},
+            {'op': 'unfollow', 'username': 'student0'},
+        )
+        self.assertEqual(resp.json()['status'], 'Batch Applied')
+        self.assertEqual(sorted(self.student.courses.values_list('code', flat=True)), ['COMP 0XA3', 'COMP 1XA3'])
+        self.assertEqual(sorted(self.student.classes.filter(course_id='COMP 1XA3').values_list('section', flat=True)),
+                         ['CO1', 'LO1', 'TO2'])
+        self.assertEqual(self.student.classes.count(), 6)
+        self.assertEqual([s.user.username for s in self.student.following.all()], ['student1'])
+        self.assertEqual([s.user.username for s in self.students[1].following.all()], ['viewer'])
+
+    def test_invalid_operation_rolls_back(self):
+        resp = self.batch({'op': 'add_course', 'code': 'COMP 0XA3'}, {'op': 'follow', 'username': 'nobody'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()['operation'], 1)
+        self.assertEqual(self.student.courses.count(), 0)
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_synthetic_data_is_deterministic(self):
+        students = generate_university(courses=6, students=8, enrollments=2, follows=2, seed=3)
+        self.assertEqual(Class.objects.count(), 6 * 7)
+        self.assertEqual(Student.objects.get(pk=students[0].pk).courses.count(), 2)
+        enrollments = Student.classes.through.objects.values_list('student__user__username', 'class__course_id', 'class__section')
+        first = sorted(enrollments)
+        for model in (Student.classes.through, Student.courses.through, Student.following.through, Class, Course):
+            model.objects.all().delete()
+        Student.objects.all().delete()
+        User.objects.all().delete()
+        generate_university(courses=6, students=8, enrollments=2, follows=2, seed=3)
+        self.assertEqual(sorted(enrollments.all()), first)
+
+    def test_every_endpoint_is_benchmarked(self):
+        students = generate_university(courses=6, students=8, enrollments=2, follows=2)
+        self.client.force_login(students[0].user)
+        requests = endpoint_requests(students[0])
+        self.assertEqual(set(requests), set(url_names()))
+        results = run_benchmarks(self.client, requests, iterations=1)
+        for name, result in results.items():
+            self.assertEqual(result['status'], 200, name)
+        self.assertGreater(results['coursematchapp-search_profiles']['serialize_ms'], 0)
+        self.assertEqual(students[0].courses.count(), 2)
+
+
+class InstrumentationTests(TestCase):
+    def test_server_timing_and_metrics(self):
+        make_students(2, nb_courses=1)
+        resp = self.client.get('/coursematchapp/searchprofiles/', {'query': 'First'})
+        self.assertRegex(resp['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="3 queries"$')
+        metrics = self.client.get('/metrics').content.decode()
+        self.assertIn('coursematch_db_queries_bucket{view="coursematchapp-search_profiles",le="3"}', metrics)
+        self.assertIn('coursematch_responses_total{view="coursematchapp-search_profiles",status="200"}', metrics)
+
+
+class RepeatedQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(8, nb_courses=2)
+        self.students[0].following.add(*self.students[1:])
+        self.client.force_login(self.students[0].user)
+
+    def test_fingerprint(self):
+        self.assertEqual(querycheck.fingerprint("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s)  AND c = 3"),
+                         'SELECT * FROM t WHERE a = ? AND b IN (?) AND c = ?')
+
+    def test_detects_query_in_loop(self):
+        with self.assertRaisesRegex(AssertionError, r'(?s)8 executions of: SELECT .*tests.py'):
+            with querycheck.assert_no_repeated_queries(threshold=5):
+                for student in Student.objects.all():
+                    student.user.get_username()
+
+    def test_views_do_not_repeat_queries(self):
+        requests = [
+            ('get', '/coursematchapp/searchprofiles/', {'query': ''}),
+            ('get', '/coursematchapp/searchcourses/', {'code': 'COMP'}),
+            ('post', '/coursematchapp/getfollowing/', {'query': ''}),
+            ('get', '/coursematchapp/bootstrap/', {}),
+            ('get', '/coursematchapp/match/', {}),
+            ('get', '/coursematchapp/getclassmates/', {}),
+        ]
+        for method, path, data in requests:
+            with querycheck.assert_no_repeated_queries(threshold=1):
+                getattr(self.client, method)(path, data)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_pragmas_applied(self):
+        with self.settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -1000}):
+            original = dbprofile.current_pragmas()
+            dbprofile.configure_connection(None, connections['default'])
+            pragmas = dbprofile.current_pragmas()
+        with self.settings(SQLITE_PRAGMAS=original):
+            dbprofile.configure_connection(None, connections['default'])
+        self.assertEqual(pragmas, {'busy_timeout': 1234, 'cache_size': -1000})
+
+    def test_replica_router(self):
+        router = dbprofile.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Course), 'default')
+        with dbprofile.replica_reads():
+            # Without a replica database reads stay on the default one
+            self.assertEqual(router.db_for_read(Course), 'default')
+            with mock.patch.dict(connections.databases, {'replica': {}}):
+                self.assertEqual(router.db_for_read(Course), 'replica')
+                self.assertEqual(router.db_for_write(Course), 'default')
+        with mock.patch.dict(connections.databases, {'replica': {}}):
+            self.assertEqual(router.db_for_read(Course), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'coursematchapp'))
+
+    def test_replica_reads_of_streamed_responses(self):
+        router = dbprofile.ReplicaRouter()
+        reads = lambda: (router.db_for_read(Course) for i in range(2))
+        request = mock.Mock(resolver_match=mock.Mock(url_name='coursematchapp-search_profiles'))
+        with mock.patch.dict(connections.databases, {'replica': {}}):
+            middleware = dbprofile.ReplicaMiddleware(None)
+            response = middleware.process_view(request, lambda request: StreamingHttpResponse(reads()), (), {})
+            self.assertEqual(router.db_for_read(Course), 'default')
+            self.assertEqual(list(response.streaming_content), [b'replica', b'replica'])
+
+
+class ReplicaSyncTests(TransactionTestCase):
+    # The backup API waits for the writes of an open transaction, so these are committed
+    def test_replica_catalog_version(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        name = os.path.join(directory, 'replica.sqlite3')
+        Course.objects.create(code='COMP 1XA3', department='Computer Science')
+        version = responsecache.catalog_version()
+        with mock.patch.dict(connections.databases, {'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}}):
+            call_command('sync_replica', stdout=io.StringIO())
+            Course.objects.create(code='COMP 2XA3', department='Computer Science')
+            # Until the next sync the replica gives the version of the catalog it holds
+            with dbprofile.replica_reads():
+                self.assertEqual(responsecache.catalog_version(), version)
+                self.assertEqual(Course.objects.count(), 1)
+            connections['replica'].close()
+            del connections['replica']
+        self.assertNotEqual(responsecache.catalog_version(), version)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        source, self.root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.mkdir(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'index.html'), 'w') as page:
+            page.write('<html><body>' + 'Course Match ' * 500 + '</body></html>')
+        with open(os.path.join(source, 'css', 'style.css'), 'w') as css:
+            css.write('body { background: url("../missing.png"); }\n' + 'p { margin: 0; }\n' * 500)
+        settings = self.settings(STATICFILES_DIRS=[source], STATIC_ROOT=self.root, INSTALLED_APPS=[
+            'coursematch_auth.apps.CoursematchAuthConfig', 'coursematchapp.apps.CoursematchappConfig',
+            'django.contrib.auth', 'django.contrib.contenttypes', 'django.contrib.sessions', 'django.contrib.staticfiles'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as manifest:
+            self.paths = json.load(manifest)['paths']
+
+    def test_collect_writes_hashed_and_compressed_files(self):
+        hashed = self.paths['css/style.css']
+        self.assertRegex(hashed, r'^css/style\.[0-9a-f]{12}\.css$')
+        for name in ('index.html', hashed):
+            with open(os.path.join(self.root, name), 'rb') as original, open(os.path.join(self.root, name + '.gz'), 'rb') as variant:
+                self.assertEqual(gzip.decompress(variant.read()), original.read())
+
+    def test_serve_precompressed(self):
+        resp = self.client.get('/coursematch/static/index.html', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        body = b''.join(resp.streaming_content)
+        self.assertEqual((resp['Content-Encoding'], resp['Content-Type'], resp['Cache-Control']), ('gzip', 'text/html', 'no-cache'))
+        self.assertIn(b'Course Match', gzip.decompress(body))
+        etag = resp['ETag']
+        for header, status in ((etag, 304), ('"other", W/' + etag, 304), ('*', 304),
+                               ('"other"', 200), ('"x{}"'.format(etag), 200)):
+            self.assertEqual(self.client.get('/coursematch/static/index.html', HTTP_ACCEPT_ENCODING='gzip',
+                                             HTTP_IF_NONE_MATCH=header).status_code, status, header)
+        resp = self.client.get('/coursematch/static/' + self.paths['css/style.css'], HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(resp.has_header('Content-Encoding'))
+        self.assertEqual(resp['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get('/coursematch/static/missing.css').status_code, 404)
+
+
+class ChangeLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(4, nb_courses=3)
+        for student in self.students:
+            student.courses.remove('COMP 2XA3')
+        self.student, self.followed, self.follower, self.other = self.students
+        self.student.following.add(self.followed)
+        self.clients = {}
+        for student in self.students:
+            self.clients[student.pk] = self.client_class()
+            self.clients[student.pk].force_login(student.user)
+
+    def changes(self, student, since):
+        return self.clients[student.pk].get('/coursematchapp/changes/', {'since': since}).json()
+
+    def test_relevant_changes(self):
+        self.assertEqual(self.client.get('/coursematchapp/changes/').content, b'NotAuthenticated')
+        self.assertEqual(self.changes(self.student, 0), {'more': False, 'changes': [], 'changed': [], 'next': 0})
+        self.clients[self.student.pk].post('/coursematchapp/addcourse/', {'code': 'COMP 2XA3'})
+        self.clients[self.followed.pk].post('/coursematchapp/removecourse/', {'code': 'COMP 0XA3'})
+        self.clients[self.follower.pk].post('/coursematchapp/followuser/', {'username': 'student0'})
+        self.clients[self.other.pk].post('/coursematchapp/addcourse/', {'code': 'COMP 2XA3'})
+        self.clients[self.other.pk].post('/coursematchapp/followuser/', {'username': 'student2'})
+        data = self.changes(self.student, 0)
+        self.assertEqual([(c['username'], c['kind'], c['target']) for c in data['changes']],
+                         [('student0', 'course_added', 'COMP 2XA3'), ('student1', 'course_removed', 'COMP 0XA3'),
+                          ('student2', 'followed', 'student0')])
+        self.assertEqual(data['changed'], ['courses', 'following'])
+        self.assertFalse(data['more'])
+        self.assertEqual(self.changes(self.student, data['next']),
+                         {'more': False, 'changes': [], 'changed': [], 'next': data['next']})
+
+    def test_paging(self):
+        for code in ('COMP 1XA3', 'COMP 0XA3'):
+            self.clients[self.followed.pk].post('/coursematchapp/removecourse/', {'code': code})
+        self.clients[self.followed.pk].post('/coursematchapp/addcourse/', {'code': 'COMP 0XA3'})
+        with mock.patch('coursematchapp.views.CHANGES_PAGE_SIZE', 2):
+            first = self.changes(self.student, 0)
+            second = self.changes(self.student, first['next'])
+        self.assertTrue(first['more'])
+        self.assertFalse(second['more'])
+        self.assertEqual([c['kind'] for c in first['changes'] + second['changes']], ['course_removed', 'course_removed', 'course_added'])
+        self.assertEqual(self.changes(self.student, 'x'), {'error': 'since must be an integer'})
+
+    def test_batch_and_rollback(self):
+        client = self.clients[self.student.pk]
+        batch = lambda *operations: client.post('/coursematchapp/batch/', json.dumps({'operations': operations}),
+                                                content_type='application/json')
+        batch({'op': 'add_course', 'code': 'COMP 2XA3'}, {'op': 'follow', 'username': 'nobody'})
+        self.assertEqual(self.changes(self.student, 0)['changes'], [])
+        batch({'op': 'add_course', 'code': 'COMP 2XA3'}, {'op': 'unfollow', 'username': 'student1'})
+        data = self.changes(self.student, 0)
+        self.assertEqual([(c['kind'], c['target']) for c in data['changes']], [('course_added', 'COMP 2XA3'), ('unfollowed', 'student1')])
+        self.assertEqual(data['changed'], ['courses', 'following'])
+
+    def test_repeated_writes_logged_once(self):
+        client = self.clients[self.student.pk]
+        for i in range(2):
+            client.post('/coursematchapp/removecourse/', {'code': 'COMP 0XA3'})
+            client.post('/coursematchapp/followuser/', {'username': 'student2'})
+            client.post('/coursematchapp/unfollowstudent/', {'username': 'student1'})
+        data = self.changes(self.student, 0)
+        self.assertEqual([(c['kind'], c['target']) for c in data['changes']],
+                         [('course_removed', 'COMP 0XA3'), ('followed', 'student2'), ('unfollowed', 'student1')])
+
+    def test_batch_switch_section(self):
+        Class.objects.create(course_id='COMP 1XA3', section='TO2', location='BSB 108')
+        client = self.clients[self.followed.pk]
+        batch = lambda *operations: client.post('/coursematchapp/batch/', json.dumps({'operations': operations}),
+                                                content_type='application/json')
+        batch({'op': 'switch_section', 'code': 'COMP 1XA3', 'section': 'TO1'})
+        self.assertEqual(self.changes(self.student, 0)['changes'], [])
+        batch({'op': 'switch_section', 'code': 'COMP 1XA3', 'section': 'TO2'})
+        for student, changed in ((self.followed, ['courses']), (self.student, ['following'])):
+            data = self.changes(student, 0)
+            self.assertEqual([(c['username'], c['kind'], c['target']) for c in data['changes']],
+                             [('student1', 'section_switched', 'COMP 1XA3')])
+            self.assertEqual(data['changed'], changed)
+        self.assertEqual(self.changes(self.other, 0)['changes'], [])
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(3, nb_courses=2)
+        self.student = self.students[0]
+        self.client.force_login(self.student.user)
+
+    def counts(self):
+        return (dict(Course.objects.values_list('code', 'student_count')),
+                dict(Class.objects.filter(section='CO1').values_list('course_id', 'student_count')),
+                [student.following_count for student in Student.objects.order_by('pk')])
+
+    def test_counters_follow_writes(self):
+        self.assertEqual(self.counts(), ({'COMP 0XA3': 3, 'COMP 1XA3': 3}, {'COMP 0XA3': 3, 'COMP 1XA3': 3}, [0, 0, 0]))
+        self.client.post('/coursematchapp/removecourse/', {'code': 'COMP 0XA3'})
+        self.client.post('/coursematchapp/removecourse/', {'code': 'COMP 0XA3'})
+        self.client.post('/coursematchapp/followuser/', {'username': 'student1'})
+        self.client.post('/coursematchapp/followuser/', {'username': 'student2'})
+        self.assertEqual(self.counts(), ({'COMP 0XA3': 2, 'COMP 1XA3': 3}, {'COMP 0XA3': 2, 'COMP 1XA3': 3}, [2, 1, 1]))
+        self.client.post('/coursematchapp/batch/', json.dumps({'operations': [
+            {'op': 'add_course', 'code': 'COMP 0XA3'}, {'op': 'unfollow', 'username': 'student1'}]}),
+            content_type='application/json')
+        self.client.get('/coursematchapp/unfollowall/')
+        self.assertEqual(self.counts(), ({'COMP 0XA3': 3, 'COMP 1XA3': 3}, {'COMP 0XA3': 3, 'COMP 1XA3': 3}, [0, 0, 0]))
+        # From the course side, and when students are deleted
+        course = Course.objects.get(code='COMP 1XA3')
+        course.student_set.remove(self.students[1])
+        self.students[2].following.add(self.students[1])
+        self.students[2].user.delete()
+        self.students[1].courses.clear()
+        self.assertEqual(self.counts(), ({'COMP 0XA3': 1, 'COMP 1XA3': 1}, {'COMP 0XA3': 2, 'COMP 1XA3': 2}, [0, 0]))
+        course.student_set.add(*self.students[1:2])
+        self.assertEqual(Course.objects.get(code='COMP 1XA3').student_count, 2)
+
+    def test_popular_courses(self):
+        course = Course.objects.create(code='MATH 1ZA3', department='Mathematics')
+        Class.objects.create(course=course, section='CO1', location='HH 109')
+        self.student.courses.remove('COMP 0XA3')
+        self.student.classes.remove(*Class.objects.filter(course_id='COMP 0XA3', section='TO1'))
+        with self.assertNumQueries(2):
+            data = self.client.get('/coursematchapp/popularcourses/', {'limit': 2}).json()
+        self.assertEqual([(c['code'], c['students']) for c in data['courses']], [('COMP 1XA3', 3), ('COMP 0XA3', 2)])
+        self.assertEqual(data['courses'][1]['sections'], [
+            {'section': 'CO1', 'kind': 'lecture', 'students': 3},
+            {'section': 'LO1', 'kind': 'lab', 'students': 3},
+            {'section': 'TO1', 'kind': 'tutorial', 'students': 2},
+        ])
+        data = self.client.get('/coursematchapp/popularcourses/', {'department': 'Mathematics'}).json()
+        self.assertEqual(data['courses'], [{'code': 'MATH 1ZA3', 'department': 'Mathematics', 'students': 0,
+                                            'sections': [{'section': 'CO1', 'kind': 'lecture', 'students': 0}]}])
+
+    def test_repair_counters(self):
+        generate_university(courses=6, students=8, enrollments=2, follows=2, seed=1)
+        for model in counters.COUNTERS:
+            self.assertEqual(counters.drifted(model), [])
+        Course.objects.filter(code='COMP 0XA3').update(student_count=0)
+        Student.objects.filter(pk=self.student.pk).update(following_count=7)
+        output = io.StringIO()
+        with self.assertRaises(SystemExit):
+            call_command('repair_counters', check=True, stdout=output)
+        self.assertIn('Course.student_count: 1 wrong', output.getvalue())
+        call_command('repair_counters', stdout=io.StringIO())
+        self.assertEqual(self.counts()[0]['COMP 0XA3'], 3)
+        self.assertEqual(Student.objects.get(pk=self.student.pk).following_count, 0)
+        call_command('repair_counters', check=True, stdout=io.StringIO())
+
+
+class FeedTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(4, nb_courses=2)
+        self.student, self.followed, self.other, self.late = self.students
+        self.followed.courses.remove('COMP 1XA3')
+        self.followed.classes.remove(*Class.objects.filter(course_id='COMP 1XA3'))
+        self.student.following.add(self.followed)
+        self.client.force_login(self.student.user)
+
+    def test_broker(self):
+        feeds = Broker()
+        first = feeds.subscribe(1, [2], maxsize=2)
+        second = feeds.subscribe(3, [], maxsize=2)
+        feeds.publish(2, {'kind': 'course_added', 'target': 'COMP 0XA3'})
+        feeds.publish(4, {'kind': 'course_added', 'target': 'COMP 0XA3'})
+        self.assertEqual(len(first.get(0)), 1)
+        self.assertEqual(second.get(0), [])
+        feeds.follow(3, [4])
+        feeds.unfollow(1, [2])
+        feeds.publish(2, {'kind': 'course_added', 'target': 'COMP 0XA3'})
+        feeds.publish(4, {'kind': 'course_added', 'target': 'COMP 0XA3'})
+        self.assertEqual((first.get(0), len(second.get(0))), ([], 1))
+        for i in range(3):
+            feeds.publish(4, {'kind': 'course_added', 'target': 'COMP 0XA3'})
+        self.assertTrue(second.overflowed)
+        first.close()
+        second.close()
+        self.assertEqual((feeds.connections(), dict(feeds.watchers), dict(feeds.subscriptions)), (0, {}, {}))
+
+    def test_stream(self):
+        response = self.client.get('/coursematchapp/feed/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 3000\nevent: ready\ndata: {"seq":0}\n\n')
+        followed = self.client_class()
+        followed.force_login(self.followed.user)
+        followed.post('/coursematchapp/addcourse/', {'code': 'COMP 1XA3'})
+        events = [line for line in next(chunks).decode().split('\n') if line.startswith('data: ')]
+        self.assertEqual([json.loads(line[6:]) for line in events], [
+            {'username': 'student1', 'kind': 'course_added', 'target': 'COMP 1XA3'},
+            {'username': 'student1', 'kind': 'section_added', 'target': 'COMP 1XA3 CO1'},
+            {'username': 'student1', 'kind': 'section_added', 'target': 'COMP 1XA3 LO1'},
+            {'username': 'student1', 'kind': 'section_added', 'target': 'COMP 1XA3 TO1'},
+        ])
+        # Changes of students who are not followed are not sent, following one starts sending theirs
+        self.other.courses.remove('COMP 0XA3')
+        self.student.following.add(self.late)
+        self.late.mood = 'Busy'
+        self.late.save(update_fields=['mood'])
+        self.assertIn(b'"username":"student3","kind":"profile_updated"', next(chunks))
+        with mock.patch('coursematchapp.feed.HEARTBEAT_SECONDS', 0):
+            self.assertEqual(next(chunks), b': heartbeat\n\n')
+        response.close()
+        self.assertEqual(broker.connections(), 0)
+
+    def test_slow_client_resyncs(self):
+        response = self.client.get('/coursematchapp/feed/')
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        with mock.patch.object(response.subscription, 'maxsize', 2):
+            self.followed.classes.add(*Class.objects.filter(course_id='COMP 1XA3'))
+        self.assertIn(b'event: resync', next(chunks))
+        self.assertEqual(list(chunks), [])
+        response.close()
+
+    def test_many_idle_connections(self):
+        followed = self.client_class()
+        followed.force_login(self.followed.user)
+        writes = [asgi_request('/coursematchapp/addcourse/', 'post', lambda i: {'code': 'COMP 1XA3'}, followed.cookies),
+                  asgi_request('/coursematchapp/removecourse/', 'post', lambda i: {'code': 'COMP 1XA3'}, followed.cookies)]
+        feeds = [asgi_request('/coursematchapp/feed/', 'get', lambda i: {}, self.client.cookies)]
+        application = ASGIHandler(get_wsgi_application(), 2)
+        self.addCleanup(application.executor.shutdown)
+        result = feed_load(application, feeds, writes, 50)
+        self.assertEqual(result['subscriptions'], 50)
+        self.assertEqual(result['delivered'], 100)
+        self.assertEqual(result['events'], 400)
+        self.assertLess(result['threads'], 10)
+        self.assertEqual(result['subscriptions_after'], 0)
+
+
+class ASGITests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = make_students(3, nb_courses=2)
+        self.students[0].following.add(*self.students[1:])
+        self.client.force_login(self.students[0].user)
+        self.application = ASGIHandler(get_wsgi_application(), 2)
+        self.addCleanup(self.application.executor.shutdown)
+        self.requests = dict(zip(['search_courses', 'search_profiles', 'get_following', 'get_user_courses'],
+                                 server_requests(endpoint_requests(self.students[0]), self.client.cookies)))
+
+    def call(self, scope, body=b''):
+        messages = []
+        received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            return received.pop()
+
+        async def send(message):
+            messages.append(message)
+        asyncio.run(self.application(scope, receive, send))
+        return messages
+
+    def test_same_response_as_wsgi(self):
+        for name, (scope, body) in self.requests.items():
+            messages = self.call(scope, body)
+            self.assertEqual(messages[0]['status'], 200)
+            self.assertFalse(messages[-1]['more_body'])
+            content = b''.join(message.get('body', b'') for message in messages[1:])
+            if scope['method'] == 'GET':
+                expected = self.client.get(scope['path'] + '?' + scope['query_string'].decode())
+            else:
+                expected = self.client.post(scope['path'], body.decode(), content_type='application/x-www-form-urlencoded')
+            self.assertEqual(json.loads(content.decode()), expected.json(), name)
+
+    def test_streams_chunks(self):
+        scope, body = self.requests['search_profiles']
+        scope = dict(scope, query_string=b'query=&format=ndjson')
+        with mock.patch('coursematchapp.views.STREAM_CHUNK_SIZE', 1):
+            messages = self.call(scope)
+        chunks = [message['body'] for message in messages[1:] if message['body']]
+        self.assertEqual(len(chunks), 3)
+
+    def test_repeated_headers(self):
+        environ = build_environ({'method': 'GET', 'path': '/', 'headers': [
+            (b'cookie', b'a=1'), (b'accept', b'text/html'), (b'cookie', b'b=2'), (b'accept', b'*/*')]}, b'')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,*/*')
+
+    def test_throughput(self):
+        result = asgi_throughput(self.application, list(self.requests.values()), clients=4, total=20)
+        self.assertEqual(result['requests'], 20)
@@ -3,16 +3,25 @@ from django.urls import path
 
 # routed from /e/kostiukb/coursematchapp
 urlpatterns = [
+    path('bootstrap/', views.bootstrap, name='coursematchapp-bootstrap'),
     path('getprofileinfo/', views.get_profile_info, name='coursematchapp-get_profile_info'),
     path('saveprofileinfo/', views.save_profile_info, name='coursematchapp-save_profile_info'),
     path('getusercourses/', views.get_user_courses, name='coursematchapp-get_user_courses'),
     path('searchcourses/', views.search_courses, name='coursematchapp-search_courses'),
+    path('popularcourses/', views.popular_courses, name='coursematchapp-popular_courses'),
     path('searchprofiles/', views.search_profiles, name='coursematchapp-search_profiles'),
     path('addcourse/', views.add_course, name='coursematchapp-add_course'),
+    path('checkconflicts/', views.check_conflicts, name='coursematchapp-check_conflicts'),
     path('removecourse/', views.remove_course, name='coursematchapp-remove_course'),
+    path('batch/', views.batch, name='coursematchapp-batch'),
     path('followuser/', views.follow_user, name='coursematchapp-follow_user'),
     path('getfollowing/', views.get_following, name='coursematchapp-get_following'),
+    path('match/', views.match, name='coursematchapp-match'),
+    path('getclassmates/', views.get_classmates, name='coursematchapp-get_classmates'),
     path('unfollowstudent/', views.unfollow_student, name='coursematchapp-unfollow_student'),
     path('unfollowall/', views.unfollow_all, name='coursematchapp-unfollow_all'),
-    path('updatepicture/', views.update_picture, name='coursematchapp-update_picture')
+    path('updatepicture/', views.update_picture, name='coursematchapp-update_picture'),
+    path('changes/', views.changes, name='coursematchapp-changes'),
+    path('feed/', views.feed, name='coursematchapp-feed'),
+    path('cachestats/', views.get_cache_stats, name='coursematchapp-get_cache_stats'),
 ]
\ No newline at end of file
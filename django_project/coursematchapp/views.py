@@ -1,19 +1,53 @@
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import StreamingHttpResponse, HttpResponseNotModified
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 import json
+from django.db import transaction
 from django.db.models import Q
 from coursematch_auth.models import Student
-from coursematchapp.models import Course, Class
+from coursematch_auth.search import search_students
+from coursematch_auth.views import user_info_dict
+from coursematchapp.models import Course, Class, Change
+from coursematchapp.encoding import JsonResponse, dumps
+from coursematchapp.loaders import load_courses, load_sections, KIND_NAMES
+from coursematchapp.schedule import find_conflicts
+from coursematchapp.matching import match_following
+from coursematchapp.batch import apply_operations, BatchError, DEFAULT_SECTIONS
+from coursematchapp.rosters import get_rosters
+from coursematchapp.changelog import record_changes, changes_since, latest_seq
+from coursematchapp.feed import broker, EventStreamResponse
+from coursematchapp.responsecache import cached_response, cache_stats, catalog_key, catalog_version, RESPONSE_TIMEOUT
 
-# Get a users profile data from their Student model
-def get_profile_info(request):
-    '''
-    Returns a dictionary with the students information from their Student model
-    '''
+# Number of courses returned per page by search_courses
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+# Seconds clients may reuse catalog search results before revalidating them
+CATALOG_MAX_AGE = 60
+# Number of changes returned per call by changes
+CHANGES_PAGE_SIZE = 500
+# Number of courses returned by popular_courses
+POPULAR_PAGE_SIZE = 10
+POPULAR_MAX_PAGE_SIZE = 50
+# Number of students read at a time when streaming profiles
+STREAM_CHUNK_SIZE = 200
+# Keys of a profile that can be requested with the fields parameter, and the Student
+# columns each of them needs
+PROFILE_FIELDS = ('uname', 'fullname', 'imgUrl', 'info', 'courses')
+PROFILE_COLUMNS = {
+    'uname': ['user__username'],
+    'fullname': ['user__first_name', 'user__last_name'],
+    'imgUrl': ['profile_url'],
+    'info': ['major', 'minor', 'year', 'gpa', 'fav_classes', 'mood', 'bio'],
+    'courses': [],
+}
+
+# Build the profile data of a Student
+def profile_info_dict(student):
     respD = {}
-    student = Student.objects.get(user=request.user)
     respD['major'] = student.major
     respD['minor'] = student.minor
     respD['year'] = student.year
@@ -21,7 +55,28 @@ def get_profile_info(request):
     respD['favClasses'] = student.fav_classes
     respD['mood'] = student.mood
     respD['bio'] = student.bio
-    return JsonResponse(respD)
+    return respD
+
+# Get a users profile data from their Student model
+@cached_response('profile')
+def get_profile_info(request):
+    '''
+    Returns a dictionary with the students information from their Student model
+    '''
+    student = request.student
+    return JsonResponse(profile_info_dict(student))
+
+# Parse a page size parameter
+def get_limit(value, default, maximum):
+    '''
+    Return the page size given as a string, falling back to the default when it is
+    missing or invalid and capping it at the maximum
+    '''
+    try:
+        limit = int(value)
+    except ValueError:
+        return default
+    return max(1, min(limit, maximum))
 
 # Get a list of courses for a given user
 def get_courses(student, query):
@@ -29,56 +84,57 @@ def get_courses(student, query):
     Return a list of courses for a given user where the course code or departement name contains
     the query string passed as an arguement.
     '''
+    return load_courses([student], query)[student.pk]
 
-    courses = []
-    for course in student.courses.filter(Q(code__icontains=query) | Q(department__icontains=query)):
-        courseD = {}    # Create a course object to hold information and classes
-        courseD['code'] = course.code
-        courseD['department'] = course.department
-        # If student has any lectures in that course
-        try:
-            course_lec = student.classes.get(course_id=course.code, section__contains="C")
-        except:
-            course_lec = None
-        if course_lec is not None:
-            courseD['lecture'] = {
-                'section': course_lec.section,
-                'prof': course_lec.prof,
-                'location': course_lec.location,
-                'times': course_lec.times
-            }
-        else:
-            courseD['lecture'] = None
-        # If student has any tutorials in that course
-        try:
-            course_tut = student.classes.get(course_id=course.code, section__contains="T")
-        except:
-            course_tut = None
-        if course_tut is not None:
-            courseD['tutorial'] = {
-                'section': course_tut.section,
-                'prof': course_tut.prof,
-                'location': course_tut.location,
-                'times': course_tut.times
-            }
-        else:
-            courseD['tutorial'] = None
-        # If student has any labs in that course
-        try:
-            course_lab = student.classes.get(course_id=course.code, section__contains="L")
-        except:
-            course_lab = None
-        if course_lab is not None:
-            courseD['lab'] = {
-                'section': course_lab.section,
-                'prof': course_lab.prof,
-                'location': course_lab.location,
-                'times' : course_lab.times
-            }
-        else:
-            courseD['lab'] = None
-        courses.append(courseD) # Add the course to the list
-    return courses
+# Parse a fields parameter
+def get_fields(value):
+    '''
+    Return the profile keys listed in a comma separated fields parameter, or every key when
+    the parameter is missing. Unknown keys are ignored.
+    '''
+    if value == '':
+        return PROFILE_FIELDS
+    names = {name.strip() for name in value.split(',')}
+    return tuple(field for field in PROFILE_FIELDS if field in names)
+
+# Only read the columns needed by some profile fields
+def project_students(students, fields):
+    '''
+    Restrict a queryset of Students to the columns the given profile fields need, so that
+    text such as the bio is not read when it is not sent. The user is only joined when one
+    of its columns is needed, as selecting it reads its whole row otherwise.
+    '''
+    columns = [column for field in fields for column in PROFILE_COLUMNS[field]]
+    if any(column.startswith('user__') for column in columns):
+        students = students.select_related('user')
+    return students.only(*(columns or ['pk']))
+
+# Build the public profile of a student
+def profile_dict(student, courses, fields=PROFILE_FIELDS):
+    '''
+    Return the dictionary rendered for a Student in the search and following sections
+    given the Student object and its list of courses, with only the given fields
+    '''
+    studentD = {}
+    if 'uname' in fields:
+        studentD['uname'] = student.user.get_username()
+    if 'fullname' in fields:
+        studentD['fullname'] = student.user.get_full_name()
+    if 'imgUrl' in fields:
+        studentD['imgUrl'] = student.profile_url
+    if 'info' in fields:
+        studentD['info'] = {
+            'major': student.major,
+            'minor': student.minor,
+            'year': student.year,
+            'gpa': student.gpa,
+            'favClasses': student.fav_classes,
+            'mood': student.mood,
+            'bio': student.bio
+        }
+    if 'courses' in fields:
+        studentD['courses'] = courses
+    return studentD
 
 # Save a user's changed profile information
 def save_profile_info(request):
@@ -118,7 +174,7 @@ def save_profile_info(request):
         return HttpResponse("Mood must be less than 60 characters")
     else:
         # Change corresponding fields from Student model
-        student = Student.objects.get(user=request.user)
+        student = request.student
         student.major = major
         student.minor = minor
         student.year = year
@@ -126,93 +182,170 @@ def save_profile_info(request):
         student.fav_classes = favclasses
         student.mood = mood
         student.bio = bio
-        # Save Student
-        student.save()
+        # Save Student, only writing the edited fields since the student may come from the cache
+        with transaction.atomic():
+            student.save(update_fields=['major', 'minor', 'year', 'gpa', 'fav_classes', 'mood', 'bio'])
+            record_changes(student.pk, [(Change.PROFILE_UPDATED, '')])
         return HttpResponse("Profile Updated")
 
+# Get the user's courses, filtered by code
+@cached_response('courses', catalog=True)
 def get_user_courses(request):
     respD = {}
-    student = Student.objects.get(user=request.user)
+    student = request.student
     query = request.POST.get('code','') # Used when filtering course request
 
     respD['courses'] = get_courses(student, query)
 
     return JsonResponse(respD)
         
-def search_courses(request):
-    query = request.GET.get('code','')
+# Get everything the home page needs at once
+def bootstrap(request):
+    '''
+    Return the user info, profile info, courses and following list of the user in a single
+    response, as { userInfo, profileInfo, courses, following, seq } with the same content as
+    getuserinfo, getprofileinfo, getusercourses and getfollowing without filters, and seq
+    the since to pass to changes to get what changed afterwards
+    '''
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    # Read the seq before the data so that changes made meanwhile are synced again
+    seq = latest_seq()
+    student = request.student
+    following = list(student.following.select_related('user'))
+    # Load the courses of the user and everyone they follow in a single batch
+    courses = load_courses([student] + following)
+    respD = {}
+    respD['userInfo'] = user_info_dict(student, len(following))
+    respD['profileInfo'] = profile_info_dict(student)
+    respD['courses'] = {'courses': courses[student.pk]}
+    respD['following'] = {'data': [profile_dict(follow, courses[follow.pk]) for follow in following]}
+    respD['seq'] = seq
+    return JsonResponse(respD)
+
+# Search the course catalog
+def search_catalog(query, cursor, limit):
+    '''
+    Return a page of courses where the course code or department contains the query string,
+    along with all of their lectures, tutorials and labs. Pages are ordered by course code
+    and start after the cursor code.
+    '''
     respD = {}
     respD['data'] = []
-    for course in Course.objects.filter(Q(code__icontains=query) | Q(department__icontains=query)):
+    # Fetch one extra course to know whether there is a next page
+    courses = Course.objects.filter(Q(code__icontains=query) | Q(department__icontains=query))
+    if cursor != '':
+        courses = courses.filter(code__gt=cursor)
+    courses = list(courses.values('code', 'department').order_by('code')[:limit + 1])
+    respD['next'] = courses[limit - 1]['code'] if len(courses) > limit else None
+    courses = courses[:limit]
+    # Get the sections of every course on the page in a single query
+    sections = load_sections([course['code'] for course in courses])
+    for course in courses:
         courseD = {}
-        courseD['code'] = course.code
-        courseD['department'] = course.department
-        # Get all lectures
-        courseD['lectures'] = []
-        for lec in Class.objects.filter(course_id=course.code, section__contains="C"):
-            lecD = {
-                'section': lec.section,
-                'prof': lec.prof,
-                'location': lec.location,
-                'times': lec.times
-            }
-            courseD['lectures'].append(lecD)
-        courseD['lectures'].sort(key=lambda x: int(x['section'][-1]))
-        # Get all tutorials
-        courseD['tutorials'] = []
-        for tut in Class.objects.filter(course_id=course.code, section__contains="T"):
-            tutD = {
-                'section': tut.section,
-                'prof': tut.prof,
-                'location': tut.location,
-                'times': tut.times
-            }
-            courseD['tutorials'].append(tutD)
-        courseD['tutorials'].sort(key=lambda x: int(x['section'][-1]))
-        # Get all labs
-        courseD['labs'] = []
-        for lab in Class.objects.filter(course_id=course.code, section__contains="L"):
-            labD = {
-                'section': lab.section,
-                'prof': lab.prof,
-                'location': lab.location,
-                'times': lab.times
-            }
-            courseD['labs'].append(labD)
-        courseD['labs'].sort(key=lambda x: int(x['section'][-1]))
+        courseD['code'] = course['code']
+        courseD['department'] = course['department']
+        courseD.update(sections[course['code']])
         respD['data'].append(courseD)
+    return respD
+
+def search_courses(request):
+    '''
+    Return a page of search_catalog results; pass the returned 'next' value as the cursor to
+    get the following page. Results are cached until the catalog changes and carry an ETag,
+    so a repeated request with If-None-Match gets a 304 after reading only the catalog version.
+    '''
+    query = request.GET.get('code','').strip().lower()
+    cursor = request.GET.get('cursor','')
+    limit = get_limit(request.GET.get('limit',''), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+    key = catalog_key(catalog_version(), 'search', query, cursor, limit)
+    etag = '"{}"'.format(key.split(':', 2)[2].replace(':', '-'))
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        content = cache.get(key)
+        if content is None:
+            content = dumps(search_catalog(query, cursor, limit))
+            cache.set(key, content, RESPONSE_TIMEOUT)
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=CATALOG_MAX_AGE)
+    return response
+
+# Get the courses with the most students
+def popular_courses(request):
+    '''
+    Given an optional department and limit, return
+    { courses: [ { code, department, students, sections: [ { section, kind, students } ] } ] }
+    with the courses that have the most enrolled students, read from the student counters
+    '''
+    limit = get_limit(request.GET.get('limit',''), POPULAR_PAGE_SIZE, POPULAR_MAX_PAGE_SIZE)
+    department = request.GET.get('department','')
+    courses = Course.objects.order_by('-student_count', 'code')
+    if department:
+        courses = courses.filter(department=department)
+    respD = {}
+    respD['courses'] = []
+    byCode = {}
+    for course in courses.values('code', 'department', 'student_count')[:limit]:
+        courseD = {'code': course['code'], 'department': course['department'],
+                   'students': course['student_count'], 'sections': []}
+        byCode[course['code']] = courseD
+        respD['courses'].append(courseD)
+    # Get the sections of every course in a single query
+    sections = (Class.objects.filter(course_id__in=list(byCode)).order_by('course_id', 'kind', 'ordinal')
+                .values('course_id', 'section', 'kind', 'student_count'))
+    for section in sections:
+        byCode[section['course_id']]['sections'].append({
+            'section': section['section'],
+            'kind': KIND_NAMES.get(section['kind']),
+            'students': section['student_count'],
+        })
     return JsonResponse(respD)
 
+# Stream Student profiles as newline delimited JSON
+def stream_profiles(students, fields=PROFILE_FIELDS):
+    '''
+    Yield the profile of every student in the queryset as one JSON line, reading the
+    students and their courses in chunks so memory use does not grow with the results
+    '''
+    chunk = []
+    for student in students.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        chunk.append(student)
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            yield from profile_lines(chunk, fields)
+            chunk = []
+    yield from profile_lines(chunk, fields)
+
+# Serialize a chunk of Student profiles as JSON lines
+def profile_lines(students, fields=PROFILE_FIELDS):
+    courses = load_courses(students) if 'courses' in fields else {}
+    for student in students:
+        yield dumps(profile_dict(student, courses.get(student.pk), fields)) + b'\n'
+
 # Search Student profiles 
 def search_profiles(request):
     '''
     Given a query string return a list of Student objects
-    to be rendered in the search Student section
+    to be rendered in the search Student section.
+    With format=ndjson the profiles are streamed one per line instead.
+    With fields=uname,fullname,imgUrl,info,courses only the listed keys are returned,
+    and the courses are not loaded unless they are listed.
     '''
     query = request.GET.get('query','')
+    fields = get_fields(request.GET.get('fields',''))
+    # Go through all Students with first_name, last_name or major matching query string
+    # using the full-text index, best matches first
+    students = project_students(search_students(Student.objects.all(), query), fields)
+    if request.GET.get('format','') == 'ndjson':
+        return StreamingHttpResponse(stream_profiles(students, fields), content_type='application/x-ndjson')
     respD = {}
     respD['data'] = []
-    # Go through all Students with first_name, last_name or major matching query string
-    for student in Student.objects.filter(Q(user__first_name__icontains=query) | 
-                                        Q(user__last_name__icontains=query) |
-                                        Q(major__icontains=query)):
-        studentD = {}
-        studentD['uname'] =  student.user.get_username()
-        fullname = student.user.get_full_name()
-        studentD['fullname'] = fullname
-        studentD['imgUrl'] = student.profile_url
-        studentD['info'] = {
-            'major': student.major,
-            'minor': student.minor,
-            'year': student.year,
-            'gpa': student.gpa,
-            'favClasses': student.fav_classes,
-            'mood': student.mood,
-            'bio': student.bio
-        }
-        studentD['courses'] = get_courses(student, '')
-
-        respD['data'].append(studentD)
+    students = list(students)
+    # Load the courses of every student in a single batch
+    courses = load_courses(students) if 'courses' in fields else {}
+    for student in students:
+        respD['data'].append(profile_dict(student, courses.get(student.pk), fields))
     return JsonResponse(respD)
         
 # Update the Student's profile avatar
@@ -222,9 +355,11 @@ def update_picture(request):
     '''
     newImgUrl = request.GET.get('url','')
     if not newImgUrl == '':
-        student = Student.objects.get(user=request.user)
+        student = request.student
         student.profile_url = newImgUrl
-        student.save()
+        with transaction.atomic():
+            student.save(update_fields=['profile_url'])
+            record_changes(student.pk, [(Change.PROFILE_UPDATED, '')])
         return HttpResponse("Profile Picture Updated")
     else:
         return HttpResponse("Failed To Update Picture")
@@ -233,51 +368,70 @@ def update_picture(request):
 def add_course(request):
     '''
     Given a unique identifier code for a course, add that course to the
-    Student object's courses relationship
+    Student object's courses relationship with its default sections.
+    With format=json the response also lists the schedule conflicts of the
+    added sections with the student's other classes.
     '''
     # Get code
     course_code = request.POST.get('code','')
+    as_json = request.POST.get('format', request.GET.get('format','')) == 'json'
     
     if not course_code == '':
         # Get Student and Course objects
-        student = Student.objects.get(user=request.user)
+        student = request.student
         newCourse = Course.objects.get(code=course_code)
         # Check if already enrolled
         course_exist_count = student.courses.filter(code=course_code).count()
         if course_exist_count > 0:
             return HttpResponse("You are already enrolled in this course")
         else:
-            # Add the course with default lecture
-            student.courses.add(newCourse)
-            try:
-                default_lec = Class.objects.get(course_id=course_code, section='CO1')
-            except:
-                default_lec = None
-
-            if default_lec is not None:
-                student.classes.add(default_lec)
-            # Add the course with default tutorial
-            try:
-                default_tut = Class.objects.get(course_id=course_code, section='TO1')
-            except:
-                default_tut = None
-            
-            if default_tut is not None:
-                student.classes.add(default_tut)
-            # Add the course with default lab
-            try:
-                default_lab = Class.objects.get(course_id=course_code, section='LO1')
-            except:
-                default_lab = None
-
-            if default_lab is not None:
-                student.classes.add(default_lab)
-            
-            student.save()
-            return HttpResponse("Course Added")
+            # Add the course with its default lecture, tutorial and lab
+            default_classes = list(Class.objects.filter(course_id=course_code, section__in=DEFAULT_SECTIONS))
+            with transaction.atomic():
+                student.courses.add(newCourse)
+                if default_classes:
+                    student.classes.add(*default_classes)
+                record_changes(student.pk, [(Change.COURSE_ADDED, course_code)])
+            if not as_json:
+                return HttpResponse("Course Added")
+            # Check the new sections against the rest of the student's schedule
+            enrolled = student.classes.exclude(course_id=course_code).only('course', 'section', 'meetings', 'time_mask')
+            return JsonResponse({
+                'status': "Course Added",
+                'conflicts': find_conflicts(default_classes, enrolled)
+            })
     else:
         return HttpResponse("Failed To Add Course")
 
+# Check a proposed set of sections for schedule conflicts
+def check_conflicts(request):
+    '''
+    Given a JSON object { sections: [ { code: String, section: String } ] } return
+    { conflicts: [...], unknown: [...] } with the conflicts between the proposed sections and
+    between them and the student's classes in other courses, and the proposed sections
+    that do not exist
+    '''
+    json_req = json.loads(request.body)
+    proposed = [(s.get('code',''), s.get('section','')) for s in json_req.get('sections', [])]
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    respD = {'conflicts': [], 'unknown': []}
+    if not proposed:
+        return JsonResponse(respD)
+    # Get all proposed sections in a single query
+    match = Q()
+    for code, section in proposed:
+        match |= Q(course_id=code, section=section)
+    fields = ('course', 'section', 'meetings', 'time_mask')
+    classes = {(cls.course_id, cls.section): cls for cls in Class.objects.filter(match).only(*fields)}
+    respD['unknown'] = [{'code': code, 'section': section} for code, section in proposed
+                        if (code, section) not in classes]
+    # The student's current classes in the proposed courses are being replaced
+    codes = {code for code, section in proposed}
+    enrolled = Class.objects.filter(student=request.user.pk).exclude(course_id__in=codes).only(*fields)
+    respD['conflicts'] = find_conflicts(list(classes.values()), enrolled)
+    return JsonResponse(respD)
+
 # Remove course from Student's courses field
 def remove_course(request):
     '''
@@ -287,16 +441,41 @@ def remove_course(request):
     course_code = request.POST.get('code','')
 
     if not course_code == '':
-        student = Student.objects.get(user=request.user)
+        student = request.student
         course_to_remove = Course.objects.get(code=course_code)
-        # Remove the course relationship from the student
-        student.courses.remove(course_to_remove)
-        # Remove all related classes, (lectures, tutorials, labs)
-        for enrolled_class in student.classes.filter(course_id=course_code):
-            student.classes.remove(enrolled_class)
+        with transaction.atomic():
+            enrolled = student.courses.filter(code=course_code).exists()
+            # Remove the course relationship from the student
+            student.courses.remove(course_to_remove)
+            # Remove all related classes, (lectures, tutorials, labs) at once
+            enrolled_classes = list(student.classes.filter(course_id=course_code))
+            if enrolled_classes:
+                student.classes.remove(*enrolled_classes)
+            # Only log the changes that happened
+            if enrolled:
+                record_changes(student.pk, [(Change.COURSE_REMOVED, course_code)])
         return HttpResponse("Course Removed")
     else:
-        HttpResponse("Failed to Remove Course")
+        return HttpResponse("Failed to Remove Course")
+
+# Apply several enrollment and follow changes at once
+def batch(request):
+    '''
+    Given a JSON object { operations: [ { op: String, ... } ] } apply every operation in a
+    single transaction (see coursematchapp.batch.apply_operations). Returns
+    { status: "Batch Applied" } or, with nothing applied,
+    { status: "Batch Failed", operation: Int, error: String }
+    '''
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    json_req = json.loads(request.body)
+    operations = json_req.get('operations', [])
+    student = request.student
+    try:
+        apply_operations(student, operations)
+    except BatchError as error:
+        return JsonResponse({'status': "Batch Failed", 'operation': error.index, 'error': error.message}, status=400)
+    return JsonResponse({'status': "Batch Applied", 'applied': len(operations)})
 
 # Follow a user from their username
 def follow_user(request):
@@ -307,47 +486,101 @@ def follow_user(request):
     uname = request.POST.get('username','')
     
     if not uname == '':
-        student = Student.objects.get(user=request.user)
+        student = request.student
         student_to_follow = Student.objects.get(user__username=uname)
-        student.following.add(student_to_follow)
-        student.save()
+        with transaction.atomic():
+            following = student.following.filter(pk=student_to_follow.pk).exists()
+            student.following.add(student_to_follow)
+            if not following:
+                record_changes(student.pk, [(Change.FOLLOWED, uname)])
         return HttpResponse("Followed Student")
     else:
         return HttpResponse("Failed to Follow Student")
 
 # Get a list of all student's the user is following
+@cached_response('following', catalog=True)
 def get_following(request):
     '''
     Given a query filter the student's the user is following
-    and return a list of their profiles
+    and return a list of their profiles, with only the keys listed in
+    the fields parameter of the URL like search_profiles
     '''
     # Get query and student objects
     query = request.POST.get('query','')
-    student = Student.objects.get(user=request.user)
+    fields = get_fields(request.GET.get('fields',''))
+    student = request.student
     # Create a return dict
     respD = {}
     respD['data'] = []
     # Create a list of profiles of the students the user is following
-    for follow in student.following.filter(Q(user__first_name__icontains=query) | Q(user__last_name__icontains=query) | Q(major__icontains=query)):
-        studentD = {}
-        studentD['uname'] = follow.user.get_username()
-        fullname = follow.user.get_full_name()
-        studentD['fullname'] = fullname
-        studentD['imgUrl'] = follow.profile_url
-        studentD['info'] = {
-            'major': follow.major,
-            'minor': follow.minor,
-            'year': follow.year,
-            'gpa': follow.gpa,
-            'favClasses': follow.fav_classes,
-            'mood': follow.mood,
-            'bio': follow.bio
-        }
-        studentD['courses'] = get_courses(student, '')
-        
-        respD['data'].append(studentD)
+    following = list(project_students(search_students(student.following.all(), query), fields))
+    # Load the courses of every followed student in a single batch
+    courses = load_courses(following) if 'courses' in fields else {}
+    for follow in following:
+        respD['data'].append(profile_dict(follow, courses.get(follow.pk), fields))
     return JsonResponse(respD)
 
+# Match the user's schedule with the students they follow
+def match(request):
+    '''
+    Return the courses and sections the user shares with each student they are
+    following, ranked by overlap
+    '''
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    student = request.student
+    respD = {}
+    respD['data'] = match_following(student)
+    return JsonResponse(respD)
+
+# Get the other students in each of the user's sections
+def get_classmates(request):
+    '''
+    Return, for every section the user is enrolled in, the other students in that section.
+    Optionally filtered to one course with 'code' and to followed students with following=1.
+    '''
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    code = request.GET.get('code','')
+    only_following = request.GET.get('following','') == '1'
+    me = request.user.pk
+    classes = Class.objects.filter(student=me).values('id', 'course_id', 'section').order_by('course_id', 'section')
+    if code != '':
+        classes = classes.filter(course_id=code)
+    classes = list(classes)
+    # Look up every roster from the reverse index
+    class_rosters = get_rosters([cls['id'] for cls in classes])
+    if only_following:
+        following = set(Student.following.through.objects.filter(from_student_id=me)
+                        .values_list('to_student_id', flat=True))
+        for class_id in class_rosters:
+            class_rosters[class_id] = class_rosters[class_id] & following
+    # Load every classmate at once
+    classmate_ids = set().union(*class_rosters.values()) - {me}
+    classmates = Student.objects.select_related('user').in_bulk(list(classmate_ids))
+    respD = {}
+    respD['data'] = []
+    for cls in classes:
+        students = [classmates[student_id] for student_id in class_rosters[cls['id']] if student_id in classmates]
+        students.sort(key=lambda student: student.user.get_username())
+        respD['data'].append({
+            'code': cls['course_id'],
+            'section': cls['section'],
+            'classmates': [{
+                'uname': student.user.get_username(),
+                'fullname': student.user.get_full_name(),
+                'imgUrl': student.profile_url
+            } for student in students]
+        })
+    return JsonResponse(respD)
+
+# Get the hit rate of the response cache
+def get_cache_stats(request):
+    '''
+    Return the hits, misses and hit rate of each kind of cached response in this process
+    '''
+    return JsonResponse(cache_stats())
+
 # Unfollow a student by their username
 def unfollow_student(request):
     # Get username
@@ -355,11 +588,14 @@ def unfollow_student(request):
 
     if not uname == '':
         # Find student object assosicated with user
-        student = Student.objects.get(user=request.user)
+        student = request.student
         unfollowed_student = Student.objects.get(user__username=uname)
         # remove student from following relationship
-        student.following.remove(unfollowed_student)
-        student.save()
+        with transaction.atomic():
+            following = student.following.filter(pk=unfollowed_student.pk).exists()
+            student.following.remove(unfollowed_student)
+            if following:
+                record_changes(student.pk, [(Change.UNFOLLOWED, uname)])
         return HttpResponse("Unfollowed Student")
     else:
         return HttpResponse("Failed to unfollow Student")
@@ -369,7 +605,50 @@ def unfollow_all(request):
     '''
     Removes all student objects from the following many-to-many relationship of the user
     '''
-    student = Student.objects.get(user=request.user)
-    student.following.clear()
-    student.save()
-    return HttpResponse("Unfollowed All")
\ No newline at end of file
+    student = request.student
+    with transaction.atomic():
+        unfollowed = list(student.following.values_list('user__username', flat=True))
+        student.following.clear()
+        record_changes(student.pk, [(Change.UNFOLLOWED, uname) for uname in unfollowed])
+    return HttpResponse("Unfollowed All")
+
+# Get the changes since the last sync
+def changes(request):
+    '''
+    Given since, the seq of the last change the client has applied, return
+    { changes: [ { seq, username, kind, target, time } ], changed: [ String ], next: Int, more: Bool }
+    with the changes to the user's courses, follows and profile and to the courses and
+    profiles of the students they follow. changed lists which of 'courses', 'following'
+    and 'profile' need to be updated, next is the since of the following call and more is
+    true when there are more changes to get right away.
+    '''
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    try:
+        since = int(request.GET.get('since','0'))
+    except ValueError:
+        return JsonResponse({'error': 'since must be an integer'}, status=400)
+    # Read the newest seq first so that changes committed meanwhile are not skipped
+    until = latest_seq()
+    changesL, lists = changes_since(request.student, since, until, CHANGES_PAGE_SIZE + 1)
+    respD = {}
+    respD['more'] = len(changesL) > CHANGES_PAGE_SIZE
+    respD['changes'] = changesL[:CHANGES_PAGE_SIZE]
+    respD['changed'] = sorted(lists)
+    respD['next'] = respD['changes'][-1]['seq'] if respD['more'] else max(since, until)
+    return JsonResponse(respD)
+
+# Stream the changes of the students the user follows
+def feed(request):
+    '''
+    Return a text/event-stream of { username, kind, target } events pushed when students the
+    user follows add or drop courses, join or leave sections or update their profile. The
+    stream starts with a ready event holding the seq to pass to changes/ to catch up and
+    sends a resync event before closing when the client falls behind.
+    '''
+    if not request.user.is_authenticated:
+        return HttpResponse("NotAuthenticated")
+    student = request.student
+    subscription = broker.subscribe(student.pk, student.following.values_list('pk', flat=True))
+    # Read the seq after subscribing so that no change falls between the two
+    return EventStreamResponse(subscription, latest_seq())
\ No newline at end of file
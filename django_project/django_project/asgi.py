@@ -0,0 +1,20 @@
+"""
+ASGI config for django_course_match project.
+
+It exposes the ASGI callable as a module-level variable named ``application``, to be run
+with an ASGI server such as ``uvicorn django_project.asgi:application``.
+
+Django 2.2 has no ASGI handler, so the WSGI handler runs in a pool of ASGI_THREADS threads
+(see django_project.asgihandler).
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from django_project.asgihandler import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+
+application = ASGIHandler(get_wsgi_application(), settings.ASGI_THREADS)
@@ -0,0 +1,157 @@
+"""
+ASGI adapter for django_course_match.
+
+Django 2.2 has no ASGI support, so ASGIHandler runs the WSGI handler of the project under an
+ASGI server. The event loop accepts connections and reads request bodies. Every request then
+runs in a pool of at most max_threads threads, so the views and their ORM queries never block
+the loop. Requests beyond the pool size wait in the loop without holding a thread. Response
+chunks are sent back as they are produced, so streamed responses stay streamed.
+
+Responses with an async_stream method, such as the event streams of the feed, are long lived.
+Their view runs in the pool, then the loop sends the chunks of async_stream() until it ends or
+the client disconnects, so thousands of idle streams hold no thread.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Build the WSGI environ of an ASGI HTTP request
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI strings are bytes decoded as latin-1
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            # Cookie headers are the only ones joined with '; ' instead of ','
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class ASGIHandler:
+    '''
+    ASGI 3 application running a WSGI application in a bounded thread pool
+    '''
+    def __init__(self, wsgi_application, max_threads):
+        self.wsgi_application = wsgi_application
+        self.max_threads = max_threads
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type {}'.format(scope['type']))
+        body = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        environ = build_environ(scope, b''.join(body))
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, self.run_wsgi, environ, loop, send)
+        if result is not None:
+            await self.send_async_stream(result, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def run_wsgi(self, environ, loop, send):
+        '''
+        Run the WSGI application in a pool thread and send its response through the event loop,
+        or return the response when its chunks are to be sent by the loop
+        '''
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        def emit(message):
+            # Wait for the message to be sent, which stops a slow client from piling up chunks
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = self.wsgi_application(environ, start_response)
+        if hasattr(result, 'async_stream'):
+            emit({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            return result
+        try:
+            started = False
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not started:
+                    emit({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+                    started = True
+                emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                emit({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            emit({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+    async def send_async_stream(self, result, receive, send):
+        '''
+        Send the chunks of result.async_stream() until it ends or the client disconnects
+        '''
+        async def relay():
+            async for chunk in result.async_stream():
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        relaying = asyncio.ensure_future(relay())
+        watching = asyncio.ensure_future(disconnected())
+        try:
+            await asyncio.wait([relaying, watching], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (relaying, watching):
+                task.cancel()
+            await asyncio.gather(relaying, watching, return_exceptions=True)
+            # Closing sends request_finished, which cleans up the database connections of a pool thread
+            await asyncio.get_running_loop().run_in_executor(self.executor, result.close)
+        if not relaying.cancelled() and relaying.exception() is not None:
+            raise relaying.exception()
@@ -0,0 +1,165 @@
+"""
+Static asset pipeline for django_course_match.
+
+CompressedManifestStaticFilesStorage is a collectstatic storage that copies every file under
+a content hashed name as well as its original name (ManifestStaticFilesStorage, which also
+writes the staticfiles.json manifest), then writes a gzip variant next to every text file,
+and a brotli variant when the brotli package is installed.
+
+The serve view sends the smallest variant the client accepts from STATIC_ROOT. Hashed
+names never change content so they are cached for a year as immutable. Original names,
+such as the index.html page users open, are revalidated with their ETag on every use.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files worth compressing, by extension
+COMPRESSIBLE = {'.html', '.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.ico', '.eot', '.ttf', '.otf'}
+# Variants are only kept when they are at most this fraction of the original size
+MIN_RATIO = 0.9
+# Encodings in order of preference with the suffix of their files
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Compress bytes with an encoding
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=11)
+    # mtime=0 gives the same bytes for the same content on every run
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''
+    ManifestStaticFilesStorage that also writes .gz and .br variants of the collected files
+    '''
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        encodings = [encoding for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+        names = set(paths) | {self.hashed_files.get(self.hash_key(self.clean_name(name))) for name in paths}
+        for name in sorted(filter(None, names)):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            for encoding in encodings:
+                if self.write_variant(name, encoding):
+                    yield name, name + dict(ENCODINGS)[encoding], True
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            # Vendored CSS refers to a few files that are not shipped, leave those urls as they are
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj.group(0)
+        return convert
+
+    def write_variant(self, name, encoding):
+        '''
+        Write the compressed variant of a collected file and return whether it is worth keeping
+        '''
+        path = self.path(name)
+        variant = path + dict(ENCODINGS)[encoding]
+        with open(path, 'rb') as original:
+            content = original.read()
+        compressed = compress(content, encoding)
+        if len(compressed) > len(content) * MIN_RATIO:
+            if os.path.exists(variant):
+                os.remove(variant)
+            return False
+        with open(variant, 'wb') as output:
+            output.write(compressed)
+        return True
+
+
+# Hash inserted by ManifestStaticFilesStorage before the extension, as in style.c44987254ca6.css
+HASH_RE = re.compile(r'^(?P<root>.+)\.[0-9a-f]{12}(?P<ext>\.[^./]+)?$')
+
+# Check whether a name is the hashed copy of a collected file
+def is_hashed(name):
+    match = HASH_RE.match(name)
+    if match is None:
+        return False
+    original = match.group('root') + (match.group('ext') or '')
+    return getattr(staticfiles_storage, 'hashed_files', {}).get(original) == name
+
+# Parse the encodings accepted by the client
+def accepted_encodings(header):
+    '''
+    Return the set of content codings in an Accept-Encoding header, without those refused with q=0
+    '''
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+# Check an If-None-Match header against the ETag of a file
+def etag_matches(header, etag):
+    '''
+    Compare the entity tags of the header with the weak comparison of If-None-Match, where
+    '*' matches any current file
+    '''
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    return etag in {tag[2:] if tag.startswith('W/') else tag for tag in etags}
+
+# Serve a collected static file
+def serve(request, path):
+    '''
+    Return a file of STATIC_ROOT, compressed with brotli or gzip when the client accepts it and
+    a variant was written by collectstatic, with immutable cache headers for hashed names
+    '''
+    name = posixpath.normpath(path).lstrip('/')
+    fullpath = safe_join(settings.STATIC_ROOT, name)
+    if not os.path.isfile(fullpath):
+        raise Http404('"{}" does not exist'.format(path))
+
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    encoding, filepath = None, fullpath
+    for coding, suffix in ENCODINGS:
+        if (coding in accepted or '*' in accepted) and os.path.isfile(fullpath + suffix):
+            encoding, filepath = coding, fullpath + suffix
+            break
+
+    stat = os.stat(filepath)
+    etag = '"{:x}-{:x}{}"'.format(int(stat.st_mtime), stat.st_size, '-' + encoding if encoding else '')
+    cache_control = IMMUTABLE if is_hashed(name) else REVALIDATE
+    modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag) or (
+            'HTTP_IF_NONE_MATCH' not in request.META and modified_since is not None
+            and int(stat.st_mtime) <= modified_since):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(filepath, 'rb'))
+        # FileResponse guesses the type from the name of the compressed file, use the original one
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
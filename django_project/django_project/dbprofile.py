@@ -0,0 +1,120 @@
+"""
+SQLite database profile for django_course_match.
+
+configure_connection runs the statements of settings.SQLITE_PRAGMAS on every new SQLite
+connection: WAL journaling lets readers work while a writer commits and busy_timeout makes
+writers wait for the lock instead of failing with "database is locked". The profile also
+uses the django_project.sqlite3 backend, whose transactions take the write lock up front.
+
+When a 'replica' database is configured, ReplicaMiddleware marks the views named in
+settings.REPLICA_VIEWS as read only and ReplicaRouter sends their reads to the replica.
+Everything else, and every write, uses the default database. The replica is a copy of the
+default database file refreshed with the sync_replica command.
+"""
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA = 'replica'
+
+_state = threading.local()
+
+
+# Apply the pragmas of the profile to a new connection
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            # The replica file is replaced as a whole by sync_replica, so it keeps its journal
+            if name == 'journal_mode' and connection.alias == REPLICA:
+                continue
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+
+# Read the pragmas of a connection
+def current_pragmas(alias='default'):
+    '''
+    Return a dictionary with the current value of every pragma in settings.SQLITE_PRAGMAS
+    '''
+    with connections[alias].cursor() as cursor:
+        values = {}
+        for name in getattr(settings, 'SQLITE_PRAGMAS', {}):
+            cursor.execute('PRAGMA {}'.format(name))
+            values[name] = cursor.fetchone()[0]
+    return values
+
+# Send the reads of a block to the replica
+@contextmanager
+def replica_reads():
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+# Read every chunk of streamed content inside replica_reads()
+def replica_stream(content):
+    '''
+    Only the reads producing each chunk go to the replica, not whatever the thread does
+    between chunks
+    '''
+    content = iter(content)
+    while True:
+        with replica_reads():
+            try:
+                chunk = next(content)
+            except StopIteration:
+                return
+        yield chunk
+
+
+class ReplicaRouter:
+    '''
+    Route reads to the replica inside replica_reads() when one is configured
+    '''
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'use_replica', False) and REPLICA in connections.databases:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema when it is copied from the default database
+        return db != REPLICA
+
+
+class ReplicaMiddleware:
+    '''
+    Run the views named in settings.REPLICA_VIEWS inside replica_reads(). Only active when
+    a replica database is configured.
+    '''
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.views = set(getattr(settings, 'REPLICA_VIEWS', []))
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.url_name not in self.views:
+            return None
+        with replica_reads():
+            response = view_func(request, *view_args, **view_kwargs)
+        if response.streaming:
+            # Streamed content is read after the view returns, possibly on another thread
+            response.streaming_content = replica_stream(response.streaming_content)
+        return response
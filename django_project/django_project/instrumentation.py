@@ -0,0 +1,122 @@
+"""
+Request instrumentation for django_course_match.
+
+RequestMetricsMiddleware records the wall time, database time and query count of every
+request under the name of its view in the urls.py files, adds them to the response as a
+Server-Timing header and aggregates them into in-process histograms. The metrics view
+exposes the histograms in the Prometheus text format.
+"""
+import bisect
+import threading
+import time
+from contextlib import ExitStack
+from django.db import connections
+from django.http import HttpResponse
+from coursematchapp.responsecache import cache_stats
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    '''
+    Cumulative histogram of observations per label value, as used by Prometheus
+    '''
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label, value):
+        # Called with the registry lock held
+        counts = self.series.get(label)
+        if counts is None:
+            counts = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+        counts[0][bisect.bisect_left(self.buckets, value)] += 1
+        counts[1] += value
+
+    def render(self, label_name):
+        lines = ['# HELP {} {}'.format(self.name, self.help_text), '# TYPE {} histogram'.format(self.name)]
+        for label, (buckets, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), buckets):
+                cumulative += count
+                lines.append('{}_bucket{{{}="{}",le="{}"}} {}'.format(self.name, label_name, label, bound, cumulative))
+            lines.append('{}_sum{{{}="{}"}} {}'.format(self.name, label_name, label, total))
+            lines.append('{}_count{{{}="{}"}} {}'.format(self.name, label_name, label, cumulative))
+        return lines
+
+
+_lock = threading.Lock()
+REQUEST_SECONDS = Histogram('coursematch_request_duration_seconds', 'Wall time of requests by view.', SECONDS_BUCKETS)
+DB_SECONDS = Histogram('coursematch_db_duration_seconds', 'Time spent in SQL queries per request by view.', SECONDS_BUCKETS)
+DB_QUERIES = Histogram('coursematch_db_queries', 'Number of SQL queries per request by view.', QUERY_BUCKETS)
+_responses = {}
+
+
+class QueryRecorder:
+    '''
+    Database execute wrapper counting the queries of a request and the time they take
+    '''
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        with _lock:
+            REQUEST_SECONDS.observe(view, elapsed)
+            DB_SECONDS.observe(view, recorder.seconds)
+            DB_QUERIES.observe(view, recorder.count)
+            key = (view, response.status_code)
+            _responses[key] = _responses.get(key, 0) + 1
+        response['Server-Timing'] = 'app;dur={:.2f}, db;dur={:.2f};desc="{} queries"'.format(
+            elapsed * 1000, recorder.seconds * 1000, recorder.count)
+        return response
+
+
+# Render every metric in the Prometheus text format
+def render_metrics():
+    with _lock:
+        lines = REQUEST_SECONDS.render('view') + DB_SECONDS.render('view') + DB_QUERIES.render('view')
+        lines += ['# HELP coursematch_responses_total Responses by view and status code.',
+                  '# TYPE coursematch_responses_total counter']
+        for (view, status), count in sorted(_responses.items()):
+            lines.append('coursematch_responses_total{{view="{}",status="{}"}} {}'.format(view, status, count))
+    stats = cache_stats()
+    for result in ('hits', 'misses'):
+        lines += ['# HELP coursematch_response_cache_{}_total Response cache {} by kind.'.format(result, result),
+                  '# TYPE coursematch_response_cache_{}_total counter'.format(result)]
+        for kind, counts in sorted(stats.items()):
+            lines.append('coursematch_response_cache_{}_total{{kind="{}"}} {}'.format(result, kind, counts[result]))
+    return '\n'.join(lines) + '\n'
+
+def metrics(request):
+    '''
+    Return the metrics of this process in the Prometheus text format
+    '''
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,122 @@
+"""
+Repeated query (N+1) detection for django_course_match.
+
+Every SQL statement is reduced to a fingerprint with its literals replaced by '?'. When the
+same fingerprint runs more than the threshold number of times in one request or block, it
+is reported with the stack of project code that issued it, usually a loop in a views.py.
+Use RepeatedQueryMiddleware in development (it is only active with DEBUG) and
+assert_no_repeated_queries in tests.
+"""
+import logging
+import os
+import re
+import traceback
+from contextlib import contextmanager, ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Statements run more than this many times in one request are reported
+DEFAULT_THRESHOLD = 5
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.I)
+SPACE_RE = re.compile(r'\s+')
+
+# Reduce an SQL statement to its shape
+def fingerprint(sql):
+    '''
+    Return the SQL with string and number literals, parameters and IN lists replaced by '?'
+    so that statements differing only by their values get the same fingerprint
+    '''
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = IN_LIST_RE.sub('IN (?)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+# Get the frames of the call stack that belong to the project
+def project_stack():
+    site = os.sep + 'site-packages' + os.sep
+    return [frame for frame in traceback.extract_stack()[:-2]
+            if frame.filename.startswith(settings.BASE_DIR) and site not in frame.filename]
+
+
+class RepeatedQueryDetector:
+    '''
+    Database execute wrapper counting statements by fingerprint. The stack is only captured
+    when a fingerprint first goes over the threshold, to keep the cost low.
+    '''
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.counts = {}
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        count = self.counts.get(shape, 0) + 1
+        self.counts[shape] = count
+        if count == self.threshold + 1:
+            self.stacks[shape] = project_stack()
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        '''
+        Return a list of (fingerprint, count, stack) for the statements over the threshold
+        '''
+        return [(shape, count, self.stacks.get(shape, [])) for shape, count in self.counts.items()
+                if count > self.threshold]
+
+    def report(self):
+        lines = []
+        for shape, count, stack in self.repeated():
+            lines.append('{} executions of: {}'.format(count, shape))
+            lines.extend('  ' + line.rstrip('\n') for line in traceback.format_list(stack))
+        return '\n'.join(lines)
+
+
+# Count queries by fingerprint in a block
+@contextmanager
+def detect_repeated_queries(threshold=DEFAULT_THRESHOLD):
+    '''
+    Context manager yielding a RepeatedQueryDetector that sees every query run on any
+    database connection inside the block
+    '''
+    detector = RepeatedQueryDetector(threshold)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+
+@contextmanager
+def assert_no_repeated_queries(threshold=DEFAULT_THRESHOLD):
+    '''
+    Context manager for tests that fails when any statement runs more than the threshold
+    number of times inside the block
+    '''
+    with detect_repeated_queries(threshold) as detector:
+        yield detector
+    if detector.repeated():
+        raise AssertionError('Repeated queries detected:\n' + detector.report())
+
+
+class RepeatedQueryMiddleware:
+    '''
+    Log a warning with the offending stack for every request that repeats a statement more
+    than settings.REPEATED_QUERY_THRESHOLD times. Only active when DEBUG is on.
+    '''
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'REPEATED_QUERY_THRESHOLD', DEFAULT_THRESHOLD)
+
+    def __call__(self, request):
+        with detect_repeated_queries(self.threshold) as detector:
+            response = self.get_response(request)
+        if detector.repeated():
+            logger.warning('Repeated queries in %s %s\n%s', request.method, request.path, detector.report())
+        return response
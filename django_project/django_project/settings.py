@@ -45,16 +45,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_project.instrumentation.RequestMetricsMiddleware',
+    'django_project.querycheck.RepeatedQueryMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'coursematch_auth.middleware.StudentMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'django_project.dbprofile.ReplicaMiddleware',
 ]
 
+# Encoder of JSON responses: 'orjson', 'json' or 'auto' for orjson when it is installed
+JSON_ENCODER = os.environ.get('COURSEMATCH_JSON_ENCODER', 'auto')
+
+# Requests running the same SQL statement more often than this are logged when DEBUG is on
+REPEATED_QUERY_THRESHOLD = 5
+
 ROOT_URLCONF = 'django_project.urls'
 
 TEMPLATES = [
@@ -75,17 +84,90 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'django_project.wsgi.application'
 
+# Threads running requests under ASGI (django_project.asgi), which bounds the number of
+# views and database connections in use at once
+ASGI_THREADS = int(os.environ.get('COURSEMATCH_ASGI_THREADS', 8))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# COURSEMATCH_DB_PROFILE=concurrent turns on WAL journaling and the pragmas below on every
+# SQLite connection and keeps connections open between requests, so that readers are not
+# blocked by writers and writers wait for the lock instead of failing. WAL is a persistent
+# property of the database file, so deployments opt in to it.
+# COURSEMATCH_DB_PROFILE=default (the default) leaves SQLite with its default settings.
+# Set COURSEMATCH_DB_REPLICA to a database file to send the reads of REPLICA_VIEWS to it
+# (see django_project.dbprofile), and refresh it with manage.py sync_replica.
+
+DATABASE_PROFILE = os.environ.get('COURSEMATCH_DB_PROFILE', 'default')
+CONCURRENT_DATABASE = DATABASE_PROFILE == 'concurrent'
+# Same as the default SQLite backend, with transactions taking the write lock when they begin
+SQLITE_ENGINE = 'django_project.sqlite3' if CONCURRENT_DATABASE else 'django.db.backends.sqlite3'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': SQLITE_ENGINE,
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('COURSEMATCH_CONN_MAX_AGE', 600)) if CONCURRENT_DATABASE else 0,
     }
 }
 
+if os.environ.get('COURSEMATCH_DB_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': SQLITE_ENGINE,
+        'NAME': os.environ['COURSEMATCH_DB_REPLICA'],
+        # sync_replica replaces the file, which connections kept open would go on reading
+        'CONN_MAX_AGE': 0,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['django_project.dbprofile.ReplicaRouter']
+
+# Views whose reads can go to the replica, by URL name. Their catalog version is read from
+# the replica too, so cached catalog results are keyed by the copy they were read from.
+REPLICA_VIEWS = [
+    'coursematchapp-search_courses',
+    'coursematchapp-search_profiles',
+    'coursematchapp-popular_courses',
+]
+
+# Run on every new SQLite connection, in order
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,       # milliseconds
+    'synchronous': 'NORMAL',    # safe with WAL, only the last commits can be lost on power failure
+    'mmap_size': 268435456,     # 256 MB
+    'cache_size': -64000,       # 64 MB
+} if CONCURRENT_DATABASE else {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Local memory by default, set COURSEMATCH_CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache and COURSEMATCH_CACHE_LOCATION
+# to a directory to share the cache between processes
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('COURSEMATCH_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('COURSEMATCH_CACHE_LOCATION', 'coursematch'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+
+
+# Sessions
+# Read from the cache and written through to the database, so that logged in requests
+# do not query the session table
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Expired sessions stay in the database until manage.py clearsessions is run
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -127,4 +209,7 @@ STATIC_URL = '/coursematch/static/'
 STATICFILES_DIRS = [
     "../elm-pages/static-files",
 ]
-STATIC_ROOT = "./static"
\ No newline at end of file
+STATIC_ROOT = "./static"
+# collectstatic copies every file under a content hashed name too, and writes gzip and
+# brotli variants that django_project.assets.serve sends to clients accepting them
+STATICFILES_STORAGE = 'django_project.assets.CompressedManifestStaticFilesStorage'
\ No newline at end of file
@@ -0,0 +1,14 @@
+"""
+SQLite backend whose transactions take the write lock when they begin.
+
+With the default deferred transactions, a transaction that reads and then writes fails with
+"database is locked" without waiting for busy_timeout when another connection committed in
+between, which is what add_course and batch do under concurrent writes. BEGIN IMMEDIATE
+waits for the lock up front instead. Used by the concurrent database profile.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -13,8 +13,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from django_project import assets
+from django_project.instrumentation import metrics
 
 # Routes from localhost:PORT/e/kostiukb/
 root = ''    #Change this root to reroute requests
@@ -22,4 +25,7 @@ root = ''    #Change this root to reroute requests
 urlpatterns = [
     path(root + 'coursematchauth/', include('coursematch_auth.urls')),
     path(root + 'coursematchapp/', include('coursematchapp.urls')),
+    path(root + 'metrics', metrics, name='metrics'),
+    # Collected static files, precompressed (runserver serves them itself unless run with --nostatic)
+    path(settings.STATIC_URL.lstrip('/') + '<path:path>', assets.serve, name='static'),
 ]